@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   bench_backends.py
+@Time    :   2026/10/18 20:36:52
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Save/load latency and throughput of the storage backends against the array size
+
+Usage:
+    python benchmarks/bench_backends.py [--sizes 100 10000 1000000] [--keys 50] [--backends memory npy sqlite]
+'''
+
+import argparse
+import numpy as np
+import os
+import tempfile
+import time
+
+from mathtools.db import open_backend
+from mathtools.db.backend import BACKENDS
+
+
+def bench(backend: str, sizes, n_keys: int, tmpdir: str):
+    handler = open_backend(os.path.join(tmpdir, backend), backend)
+
+    for size in sizes:
+        data = np.random.default_rng(0).random(size)
+        mb = data.nbytes * n_keys / 1e6
+
+        save_times = []
+        for i in range(n_keys):
+            # Distinct contents, so that the sqlite backend doesn't deduplicate them
+            data[0] = i
+
+            start = time.perf_counter()
+            handler.save_numpy(f"size{size}.key{i}", data)
+            save_times.append(time.perf_counter() - start)
+        handler.flush()
+
+        load_times = []
+        for i in range(n_keys):
+            start = time.perf_counter()
+            handler.load_numpy(f"size{size}.key{i}")
+            load_times.append(time.perf_counter() - start)
+
+        print(f"{backend:<8} {size:>10} "
+              f"{np.median(save_times) * 1e3:>10.3f} {mb / sum(save_times):>10.1f} "
+              f"{np.median(load_times) * 1e3:>10.3f} {mb / sum(load_times):>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 1_000_000],
+                        help="Number of float64 per array")
+    parser.add_argument("--keys", type=int, default=50, help="Number of arrays saved and loaded per size")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS.keys()))
+    args = parser.parse_args()
+
+    print(f"{'backend':<8} {'size':>10} {'save ms':>10} {'save MB/s':>10} {'load ms':>10} {'load MB/s':>10}")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for backend in args.backends:
+            bench(backend, args.sizes, args.keys, tmpdir)
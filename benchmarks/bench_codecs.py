@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   bench_codecs.py
+@Time    :   2026/10/18 11:41:09
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Size/speed trade-off of the DataHandler codecs
+
+Usage:
+    python benchmarks/bench_codecs.py [--size 1000000] [--repeat 3]
+'''
+
+import argparse
+import numpy as np
+import os
+import tempfile
+import time
+
+from mathtools.db import DataHandler
+
+CODECS = [None, "zlib", "lzma", "bz2", "shuffle+zlib", "shuffle+lzma", "shuffle+bz2"]
+
+
+def gen_datas(size: int):
+    rng = np.random.default_rng(0)
+    t = np.linspace(0, 100, size)
+
+    return {
+        "smooth": np.sin(t) + 0.01 * t,
+        "random_walk": np.cumsum(rng.normal(size=size)),
+        "noise": rng.random(size)
+    }
+
+
+def bench(size: int, repeat: int):
+    datas = gen_datas(size)
+
+    print(f"{'data':<12} {'codec':<14} {'ratio':>7} {'save MB/s':>10} {'load MB/s':>10}")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # Every repeat rewrites the same data, which dedup would skip
+        dh = DataHandler(os.path.join(tmpdir, "bench"), is_dedup=False)
+
+        for data_name, data in datas.items():
+            mb = data.nbytes / 1e6
+
+            for codec in CODECS:
+                key = f"{data_name}.{codec}"
+
+                start = time.perf_counter()
+                for i in range(repeat):
+                    dh.save_numpy(key, data, is_force=True, codec=codec)
+                save_time = (time.perf_counter() - start) / repeat
+
+                start = time.perf_counter()
+                for i in range(repeat):
+                    dh.load_numpy(key)
+                load_time = (time.perf_counter() - start) / repeat
+
+                stored = dh.db.execute(
+                    "SELECT LENGTH(data) FROM ndarray WHERE id=(SELECT id FROM paths WHERE path=?)",
+                    (key.replace(".", "\x1f"), ))[0][0]
+
+                print(f"{data_name:<12} {str(codec):<14} {data.nbytes / stored:>7.2f} "
+                      f"{mb / save_time:>10.1f} {mb / load_time:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=1_000_000, help="Number of float64 per array")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    bench(args.size, args.repeat)
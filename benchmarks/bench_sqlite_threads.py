@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   bench_sqlite_threads.py
+@Time    :   2026/10/18 13:32:18
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Read throughput of DataHandler against the number of reader threads
+
+Usage:
+    python benchmarks/bench_sqlite_threads.py [--keys 200] [--size 100000] [--duration 2] [--with-writer]
+'''
+
+import argparse
+import numpy as np
+import os
+import tempfile
+import threading
+import time
+
+from mathtools.db import DataHandler
+
+
+def bench(n_keys: int, size: int, duration: float, is_with_writer: bool):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        dh = DataHandler(os.path.join(tmpdir, "bench"))
+
+        with dh.batch():
+            for i in range(n_keys):
+                dh.save_numpy(f"read.{i}", np.random.rand(size))
+
+        print(f"{'threads':>7} {'loads/s':>10} {'MB/s':>10} {'writes/s':>10}")
+
+        for n_threads in [1, 2, 4, 8, 16]:
+            stop = threading.Event()
+            counts = [0] * n_threads
+            writes = [0]
+
+            def reader(n):
+                rng = np.random.default_rng(n)
+                while (not stop.is_set()):
+                    dh.load_numpy(f"read.{rng.integers(n_keys)}")
+                    counts[n] += 1
+
+            def writer():
+                data = np.random.rand(size)
+                while (not stop.is_set()):
+                    # New content each time, dedup would only add a reference otherwise
+                    data[0] = writes[0]
+                    dh.save_numpy(f"write.{n_threads}.{writes[0]}", data)
+                    writes[0] += 1
+
+            threads = [threading.Thread(target=reader, args=(n, )) for n in range(n_threads)]
+            if (is_with_writer):
+                threads.append(threading.Thread(target=writer))
+
+            for thread in threads:
+                thread.start()
+            time.sleep(duration)
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+            loads = sum(counts) / duration
+            print(f"{n_threads:>7} {loads:>10.1f} {loads * size * 8 / 1e6:>10.1f} {writes[0] / duration:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=200)
+    parser.add_argument("--size", type=int, default=100_000, help="Number of float64 per array")
+    parser.add_argument("--duration", type=float, default=2.0, help="Seconds per thread count")
+    parser.add_argument("--with-writer", action="store_true", help="Run a writer thread alongside the readers")
+    args = parser.parse_args()
+
+    bench(args.keys, args.size, args.duration, args.with_writer)
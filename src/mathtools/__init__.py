@@ -1,9 +1,28 @@
 
 __version__ = '0.0.1'
 
-from .initialize import init, dataer
+from typing import TYPE_CHECKING
+
+from .utils.lazy import lazy_attrs
+
+# Imported on first access, so that `import mathtools` stays cheap for the scripts which use
+# only some of the subpackages
+__getattr__, __dir__ = lazy_attrs(__name__, {
+    'init': '.initialize',
+    'init_scope': '.initialize',
+    'dataer': '.initialize',
+    'algorithm': None,
+    'db': None,
+    'drawer': None,
+    'optimizer': None,
+    'utils': None
+})
+
+if (TYPE_CHECKING):
+    from .initialize import init, init_scope, dataer
 
 __all__ = [
     'init',
+    'init_scope',
     'dataer'
 ]
@@ -1,5 +1,13 @@
 from .data_handler import DataHandler
+from .async_handler import AsyncDataHandler
+from .backend import Backend, MemoryBackend, NpyDirBackend, open_backend, register_backend
 
 __all__ = [
-    "DataHandler"
+    "DataHandler",
+    "AsyncDataHandler",
+    "Backend",
+    "MemoryBackend",
+    "NpyDirBackend",
+    "open_backend",
+    "register_backend"
 ]
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   async_handler.py
+@Time    :   2026/10/18 14:05:44
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Asyncio API of the DataHandler
+'''
+
+import asyncio
+import functools
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from .data_handler import DataHandler, PATH_SEP
+
+
+class AsyncDataHandler():
+    def __init__(self, dataer: DataHandler, max_workers: int = 4) -> None:
+        """Run the storage and serialization of a DataHandler on a bounded thread pool
+
+        Writes of the same key are applied in the order they are called, and a load waits for
+        the writes of its key which are called before it. Everything else runs concurrently.
+
+        Examples:
+            >>> adataer = AsyncDataHandler(DataHandler("task"))
+            >>> await adataer.asave_numpy("exp1.loss", loss)
+            >>> results = await asyncio.gather(*[adataer.aload_numpy(f"exp{i}.loss") for i in range(10)])
+
+        Args:
+            dataer (DataHandler): The wrapped data handler
+            max_workers (int, optional): Number of worker threads. Defaults to 4.
+        """
+        self.dataer = dataer
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mathtools-db")
+
+        # key -> the last write task of the key
+        self.pending_writes: Dict[str, asyncio.Future] = {}
+
+    def __key(self, dict_str: str, split_str: str) -> str:
+        return PATH_SEP.join(dict_str.split(split_str))
+
+    async def __run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def __run_after(self, previous: asyncio.Future, func, *args, **kwargs):
+        if (previous is not None):
+            # Only the order matters, the error of the previous write belongs to its caller
+            await asyncio.wait([previous])
+
+        return await self.__run(func, *args, **kwargs)
+
+    async def __write(self, key: str, func, *args, **kwargs):
+        task = asyncio.ensure_future(self.__run_after(self.pending_writes.get(key), func, *args, **kwargs))
+        self.pending_writes[key] = task
+
+        try:
+            # Shield the task, a cancelled caller must not break the order of the later writes
+            return await asyncio.shield(task)
+        finally:
+            if (self.pending_writes.get(key) is task):
+                del self.pending_writes[key]
+
+    async def __read(self, key: str, func, *args, **kwargs):
+        return await self.__run_after(self.pending_writes.get(key), func, *args, **kwargs)
+
+    async def asave_numpy(self, dict_str: str, ndarray: np.ndarray, split_str: str = ".", **kwargs):
+        """Async `DataHandler.save_numpy`"""
+        return await self.__write(self.__key(dict_str, split_str),
+                                  self.dataer.save_numpy, dict_str, ndarray, split_str=split_str, **kwargs)
+
+    async def aappend_numpy(self, dict_str: str, rows: np.ndarray, split_str: str = ".", **kwargs):
+        """Async `DataHandler.append_numpy`"""
+        return await self.__write(self.__key(dict_str, split_str),
+                                  self.dataer.append_numpy, dict_str, rows, split_str=split_str, **kwargs)
+
+    async def aload_numpy(self, dict_str: str, split_str: str = ".", **kwargs) -> 'np.ndarray':
+        """Async `DataHandler.load_numpy`"""
+        return await self.__read(self.__key(dict_str, split_str),
+                                 self.dataer.load_numpy, dict_str, split_str=split_str, **kwargs)
+
+    async def asave_obj(self, dict_str: str, obj: object, split_str: str = ".", **kwargs):
+        """Async `DataHandler.save_obj`"""
+        return await self.__write(self.__key(dict_str, split_str),
+                                  self.dataer.save_obj, dict_str, obj, split_str=split_str, **kwargs)
+
+    async def aload_obj(self, dict_str: str, split_str: str = ".") -> object:
+        """Async `DataHandler.load_obj`"""
+        return await self.__read(self.__key(dict_str, split_str),
+                                 self.dataer.load_obj, dict_str, split_str=split_str)
+
+    def close(self, wait: bool = True) -> None:
+        """Shut down the worker threads
+
+        Args:
+            wait (bool, optional): Wait for the running calls to finish. Defaults to True.
+        """
+        self.executor.shutdown(wait=wait)
+
+    async def __aenter__(self) -> 'AsyncDataHandler':
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        # Don't block the event loop while the workers finish
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
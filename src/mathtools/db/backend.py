@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   backend.py
+@Time    :   2026/10/18 20:11:06
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Storage backends of the global dataer
+'''
+
+import abc
+import fnmatch
+import numpy as np
+import os
+import pickle
+import threading
+import warnings
+
+from typing import Callable, Dict, Iterator, List, Tuple
+from urllib.parse import quote, unquote
+
+from .data_handler import DataHandler, PATH_SEP
+from .interface import Backend
+from .singleton import singleton
+
+
+class KeyValueBackend(Backend):
+    def __init__(self) -> None:
+        """Key path logic shared by the backends below, which only need to store the data of a path"""
+        self.lock = threading.RLock()
+
+    def reopen(self) -> None:
+        # It may be held by another thread of the parent
+        self.lock = threading.RLock()
+
+    @abc.abstractmethod
+    def _kind(self, path: str) -> str:
+        """"ndarray" or "object" if the path is a leaf, else None"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def _has_children(self, path: str) -> bool:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def _paths(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def _write(self, path: str, kind: str, data: object) -> None:
+        """Store a ndarray, or the pickle of an object"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def _read(self, path: str) -> object:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def _remove(self, path: str) -> None:
+        raise NotImplementedError
+
+    def __to_path(self, dict_str: str, split_str: str) -> str:
+        keys = dict_str.split(split_str)
+
+        if ('' in keys):
+            raise KeyError("The keys is empty, can't insert the values.")
+
+        return PATH_SEP.join(keys)
+
+    def __save(self, dict_str: str, split_str: str, is_force: bool, kind: str, data: object) -> bool:
+        path = self.__to_path(dict_str, split_str)
+
+        with self.lock:
+            if (self._kind(path) is None):
+                # A leaf can't be the parent of another path, and a parent can't become a leaf
+                keys = path.split(PATH_SEP)
+                for i in range(1, len(keys)):
+                    if (self._kind(PATH_SEP.join(keys[:i])) is not None):
+                        raise KeyError(f"The path {split_str.join(keys[:i])} of {dict_str} is already a leaf.")
+
+                if (self._has_children(path)):
+                    raise KeyError(f"The path {dict_str} has children, can't be a leaf.")
+
+            elif (not is_force):
+                warnings.warn(f"The path {dict_str} already exists. \
+                    If you want to force update, please set is_force=True.")
+
+                return False
+
+            self._write(path, kind, data)
+
+        return True
+
+    def __load(self, dict_str: str, split_str: str, kind: str) -> object:
+        path = self.__to_path(dict_str, split_str)
+
+        with self.lock:
+            if (self._kind(path) != kind):
+                raise KeyError(f"The path {dict_str} is not exists.")
+
+            return self._read(path)
+
+    def save_numpy(self, dict_str: str, ndarray: np.ndarray, is_force: bool = False, split_str: str = ".") -> bool:
+        return self.__save(dict_str, split_str, is_force, "ndarray", np.asanyarray(ndarray))
+
+    def load_numpy(self, dict_str: str, split_str: str = ".") -> 'np.ndarray':
+        return self.__load(dict_str, split_str, "ndarray")
+
+    def save_obj(self, dict_str: str, obj: object, info: str = "", split_str: str = ".", is_force: bool = False) -> bool:
+        return self.__save(dict_str, split_str, is_force, "object", pickle.dumps(obj, protocol=5))
+
+    def load_obj(self, dict_str: str, split_str: str = ".") -> object:
+        return pickle.loads(self.__load(dict_str, split_str, "object"))
+
+    def delete(self, dict_str: str, split_str: str = ".") -> None:
+        path = self.__to_path(dict_str, split_str)
+
+        with self.lock:
+            if (self._kind(path) is None):
+                raise KeyError(f"The path {dict_str} is not exists.")
+
+            self._remove(path)
+
+    def keys(self, pattern: str = None, split_str: str = ".") -> List[str]:
+        with self.lock:
+            paths = sorted(self._paths())
+
+        keys = [path.split(PATH_SEP) for path in paths]
+
+        if (pattern is not None):
+            patterns = pattern.split(split_str)
+            keys = [components for components in keys if len(components) == len(patterns)
+                    and all(fnmatch.fnmatchcase(c, p) for c, p in zip(components, patterns))]
+
+        return [split_str.join(components) for components in keys]
+
+    def exists(self, dict_str: str, split_str: str = ".") -> bool:
+        path = self.__to_path(dict_str, split_str)
+
+        with self.lock:
+            return self._kind(path) is not None
+
+
+@singleton
+class MemoryBackend(KeyValueBackend):
+    def __init__(self, task_name: str) -> None:
+        """Keep the data in the memory of this process, for tests and scratch runs
+
+        ndarrays are copied in and out, so the caller and the backend never share them.
+
+        Args:
+            task_name (str): The name of task, handlers of the same name share the data
+        """
+        super().__init__()
+
+        self.task_name = task_name
+        self.datas: Dict[str, Tuple[str, object]] = {}
+
+    def _kind(self, path: str) -> str:
+        return self.datas[path][0] if path in self.datas else None
+
+    def _has_children(self, path: str) -> bool:
+        return any(key.startswith(path + PATH_SEP) for key in self.datas)
+
+    def _paths(self) -> Iterator[str]:
+        return list(self.datas.keys())
+
+    def _write(self, path: str, kind: str, data: object) -> None:
+        self.datas[path] = (kind, data.copy() if kind == "ndarray" else data)
+
+    def _read(self, path: str) -> object:
+        kind, data = self.datas[path]
+        return data.copy() if kind == "ndarray" else data
+
+    def _remove(self, path: str) -> None:
+        del self.datas[path]
+
+    def close(self) -> None:
+        # The data is dropped with the last reference of the handler
+        MemoryBackend.discard(self.task_name, self)
+
+
+@singleton
+class NpyDirBackend(KeyValueBackend):
+    def __init__(self, task_name: str) -> None:
+        """Keep each ndarray as a `.npy` file (and each object as a `.pkl` file) in a directory tree
+
+        The key path "exp1.run1.loss" is stored as `{task_name}.npydir/exp1/run1/loss.npy`, readable
+        by any tool which reads `.npy` files.
+
+        Args:
+            task_name (str): The name of task
+        """
+        super().__init__()
+
+        self.task_name = task_name
+        self.root = f"{task_name}.npydir"
+
+        os.makedirs(self.root, exist_ok=True)
+
+    def __dir(self, path: str) -> str:
+        # Dots are quoted too, so that no component is "." or ".." and the suffix is unambiguous
+        return os.path.join(self.root, *[quote(key, safe="").replace(".", "%2E") for key in path.split(PATH_SEP)])
+
+    def __file(self, path: str, kind: str) -> str:
+        return self.__dir(path) + (".npy" if kind == "ndarray" else ".pkl")
+
+    def _kind(self, path: str) -> str:
+        for kind in ["ndarray", "object"]:
+            if (os.path.isfile(self.__file(path, kind))):
+                return kind
+
+        return None
+
+    def _has_children(self, path: str) -> bool:
+        return os.path.isdir(self.__dir(path)) and len(os.listdir(self.__dir(path))) != 0
+
+    def _paths(self) -> Iterator[str]:
+        for dir_path, _, files in os.walk(self.root):
+            keys = [unquote(key) for key in os.path.relpath(dir_path, self.root).split(os.sep) if key != "."]
+
+            for file in files:
+                name, suffix = os.path.splitext(file)
+                if (suffix in [".npy", ".pkl"]):
+                    yield PATH_SEP.join(keys + [unquote(name)])
+
+    def _write(self, path: str, kind: str, data: object) -> None:
+        file = self.__file(path, kind)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+
+        # Write aside and swap, so that a failed save keeps the old file
+        with open(f"{file}.tmp", "wb") as f:
+            if (kind == "ndarray"):
+                np.save(f, data)
+            else:
+                f.write(data)
+        os.replace(f"{file}.tmp", file)
+
+        # A save may change the kind of the path
+        other = self.__file(path, "object" if kind == "ndarray" else "ndarray")
+        if (os.path.isfile(other)):
+            os.remove(other)
+
+    def _read(self, path: str) -> object:
+        kind = self._kind(path)
+
+        if (kind == "ndarray"):
+            return np.load(self.__file(path, kind), allow_pickle=True)
+
+        with open(self.__file(path, kind), "rb") as f:
+            return f.read()
+
+    def _remove(self, path: str) -> None:
+        os.remove(self.__file(path, self._kind(path)))
+
+        # Drop the directories left empty
+        dir_path = os.path.dirname(self.__dir(path))
+        while (os.path.abspath(dir_path) != os.path.abspath(self.root) and len(os.listdir(dir_path)) == 0):
+            os.rmdir(dir_path)
+            dir_path = os.path.dirname(dir_path)
+
+    def close(self) -> None:
+        NpyDirBackend.discard(self.task_name, self)
+
+
+BACKENDS: Dict[str, Callable[..., Backend]] = {
+    "sqlite": DataHandler,
+    "memory": MemoryBackend,
+    "npy": NpyDirBackend
+}
+
+
+def register_backend(name: str, factory: Callable[..., Backend]) -> None:
+    """Register a backend, selectable by `init(task_name, backend=name)`
+
+    Args:
+        name (str): The name of backend
+        factory (Callable[..., Backend]): Called with the task name and the options of `init`
+    """
+    BACKENDS[name] = factory
+
+
+def open_backend(task_name: str, backend: str = "sqlite", **kwargs) -> Backend:
+    """Open the storage of a task
+
+    Args:
+        task_name (str): The name of task
+        backend (str, optional): One of `BACKENDS`. Defaults to "sqlite", a `DataHandler`.
+        **kwargs: Options of the backend
+
+    Returns:
+        Backend: The handler
+    """
+    if (backend not in BACKENDS):
+        raise ValueError(f"Unknown backend {backend}, expect one of {list(BACKENDS.keys())}.")
+
+    return BACKENDS[backend](task_name, **kwargs)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   cache.py
+@Time    :   2026/10/18 12:20:52
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Memory-budgeted LRU cache of loaded data
+'''
+
+import threading
+
+from collections import OrderedDict, namedtuple
+from typing import Hashable, Tuple
+
+
+# Number of generation counters, keys share them by hash so that their memory stays bounded
+GENERATION_SLOTS = 1024
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "evictions", "count", "size", "max_size"])
+
+
+class LRUCache():
+    def __init__(self, max_size: int) -> None:
+        """LRU cache bounded by the total size of its values
+
+        Args:
+            max_size (int): Budget in bytes, 0 disables the cache
+        """
+        self.max_size = max_size
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+        # Bumped by `invalidate` (per slot of keys and in total) and `clear`, see `generation`
+        self.generations = [0] * GENERATION_SLOTS
+        self.invalidations = 0
+        self.clears = 0
+
+    def generation(self, key: Hashable = None) -> Tuple[int, int, int]:
+        """Version of a key (of any key if None), taken before reading a value from the storage
+
+        `put` drops the value if the key has been invalidated since, as the value may be stale.
+        """
+        with self.lock:
+            if (key is None):
+                return self.clears, None, self.invalidations
+
+            slot = hash(key) % GENERATION_SLOTS
+            return self.clears, slot, self.generations[slot]
+
+    def get(self, key: Hashable, default: object = None) -> object:
+        """Get a value and mark it as recently used, `default` if not cached"""
+        with self.lock:
+            if (key not in self.items):
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self.items.move_to_end(key)
+            return self.items[key][0]
+
+    def put(self, key: Hashable, value: object, nbytes: int, generation: Tuple[int, int, int] = None) -> None:
+        """Cache a value, evict the least recently used values to stay in budget
+
+        Values bigger than the whole budget are not cached, nor values read before an invalidation of
+        their key, i.e. `generation` is outdated.
+        """
+        with self.lock:
+            if (generation is not None):
+                clears, slot, count = generation
+                if (clears != self.clears or count != (self.invalidations if slot is None else self.generations[slot])):
+                    return
+
+            self.__pop(key)
+
+            if (nbytes > self.max_size):
+                return
+
+            self.items[key] = (value, nbytes)
+            self.size += nbytes
+
+            while (self.size > self.max_size):
+                _, (_, size) = self.items.popitem(last=False)
+                self.size -= size
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a value if it is cached"""
+        with self.lock:
+            self.__pop(key)
+
+            self.generations[hash(key) % GENERATION_SLOTS] += 1
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop all values, the counters are kept"""
+        with self.lock:
+            self.items.clear()
+            self.size = 0
+            self.clears += 1
+
+    def info(self) -> CacheInfo:
+        """Hit/miss/eviction counters and the current usage"""
+        with self.lock:
+            return CacheInfo(self.hits, self.misses, self.evictions, len(self.items), self.size, self.max_size)
+
+    def __pop(self, key: Hashable):
+        if (key in self.items):
+            self.size -= self.items.pop(key)[1]
+
+    def __len__(self) -> int:
+        return len(self.items)
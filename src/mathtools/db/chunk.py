@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   chunk.py
+@Time    :   2026/10/18 09:12:40
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Split ndarrays into fixed-size tiles and rebuild (parts of) them
+'''
+
+import itertools
+import numpy as np
+
+from typing import Dict, Iterator, List, Sequence, Tuple, Union
+
+
+def normalize_chunks(shape: Tuple[int, ...], chunks: Union[int, Sequence]) -> Tuple[int, ...]:
+    """Complete the tile shape of an array
+
+    Args:
+        shape (Tuple[int, ...]): Shape of the array
+        chunks (int | Sequence): Tile size along the leading axes, None or missing axes are not split
+
+    Returns:
+        Tuple[int, ...]: Tile size of every axis
+    """
+    if (isinstance(chunks, (int, np.integer))):
+        chunks = (chunks, )
+
+    chunks = tuple(chunks)
+    if (len(chunks) > len(shape)):
+        raise ValueError(f"The chunks {chunks} has more axes than the shape {shape}.")
+
+    chunks = chunks + (None, ) * (len(shape) - len(chunks))
+
+    result = []
+    for chunk, dim in zip(chunks, shape):
+        if (chunk is None):
+            result.append(max(dim, 1))
+        elif (int(chunk) < 1):
+            raise ValueError(f"The chunk size must be positive, got {chunk}.")
+        else:
+            result.append(int(chunk))
+
+    return tuple(result)
+
+
+def grid_shape(shape: Tuple[int, ...], chunks: Tuple[int, ...]) -> Tuple[int, ...]:
+    """Number of tiles along every axis"""
+    return tuple(-(-dim // chunk) for dim, chunk in zip(shape, chunks))
+
+
+def tile_index(coord: Tuple[int, ...], grid: Tuple[int, ...]) -> int:
+    """Linear (C-order) index of a tile.
+
+    Growing the first axis of the grid doesn't change the index of existing tiles.
+    """
+    index = 0
+    for k, n in zip(coord, grid):
+        index = index * n + k
+
+    return index
+
+
+def tile_slices(coord: Tuple[int, ...], shape: Tuple[int, ...], chunks: Tuple[int, ...]) -> Tuple[slice, ...]:
+    """The region of the array covered by a tile"""
+    return tuple(slice(k * chunk, min((k + 1) * chunk, dim)) for k, chunk, dim in zip(coord, chunks, shape))
+
+
+def iter_tiles(ndarray: np.ndarray, chunks: Tuple[int, ...], start: int = 0) -> Iterator[Tuple[int, bytes]]:
+    """Split an array into tiles
+
+    Args:
+        ndarray (np.ndarray): The array
+        chunks (Tuple[int, ...]): Tile size of every axis
+        start (int, optional): Tile row (along the first axis) the array begins at. Defaults to 0.
+
+    Yields:
+        Tuple[int, bytes]: Linear index and C-order raw bytes of every tile
+    """
+    grid = grid_shape(ndarray.shape, chunks)
+    full_grid = (grid[0] + start, ) + grid[1:]
+
+    for coord in itertools.product(*[range(n) for n in grid]):
+        tile = ndarray[tile_slices(coord, ndarray.shape, chunks)]
+        yield tile_index((coord[0] + start, ) + coord[1:], full_grid), np.ascontiguousarray(tile).tobytes()
+
+
+def parse_slices(shape: Tuple[int, ...], slices) -> Tuple[List[np.ndarray], List[int]]:
+    """Turn a basic numpy index into the selected positions of every axis
+
+    Args:
+        shape (Tuple[int, ...]): Shape of the array
+        slices: Integers, slices and Ellipsis, as accepted by `ndarray[...]`
+
+    Returns:
+        Tuple[List[np.ndarray], List[int]]: Selected positions of every axis, and the axes indexed by an integer
+    """
+    if (slices is None):
+        slices = ()
+    elif (not isinstance(slices, tuple)):
+        slices = (slices, )
+
+    n_ellipsis = sum(1 for s in slices if s is Ellipsis)
+    if (n_ellipsis > 1):
+        raise IndexError("An index can only have a single ellipsis ('...').")
+
+    n_axes = len(slices) - n_ellipsis
+    if (n_axes > len(shape)):
+        raise IndexError(f"Too many indices for array: array is {len(shape)}-dimensional, but {n_axes} were indexed.")
+
+    if (n_ellipsis == 0):
+        slices = slices + (Ellipsis, )
+
+    i = slices.index(Ellipsis)
+    slices = slices[:i] + (slice(None), ) * (len(shape) - n_axes) + slices[i + 1:]
+
+    indices, int_axes = [], []
+    for axis, (s, dim) in enumerate(zip(slices, shape)):
+        if (isinstance(s, slice)):
+            indices.append(np.arange(dim)[s])
+
+        elif (isinstance(s, (int, np.integer))):
+            if (s < -dim or s >= dim):
+                raise IndexError(f"Index {s} is out of bounds for axis {axis} with size {dim}.")
+
+            indices.append(np.array([s % dim]))
+            int_axes.append(axis)
+
+        else:
+            raise IndexError("Only integers, slices and Ellipsis are supported in chunked reads.")
+
+    return indices, int_axes
+
+
+def _as_index(positions: np.ndarray):
+    # Contiguous ascending positions are much faster as a slice
+    if (len(positions) != 0 and positions[-1] - positions[0] == len(positions) - 1 and np.all(np.diff(positions) == 1)):
+        return slice(int(positions[0]), int(positions[-1]) + 1)
+
+    return positions
+
+
+def _group_by_tile(positions: np.ndarray, chunk: int) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    tiles = positions // chunk
+    uniques, inverse = np.unique(tiles, return_inverse=True)
+
+    order = np.argsort(inverse, kind="stable")
+    groups = np.split(order, np.cumsum(np.bincount(inverse, minlength=len(uniques)))[:-1])
+
+    # Tile -> (positions in the output, positions in the tile)
+    return {int(k): (group, positions[group] - k * chunk) for k, group in zip(uniques, groups)}
+
+
+def select_tiles(shape: Tuple[int, ...], chunks: Tuple[int, ...], indices: List[np.ndarray]) -> List[int]:
+    """Linear indices of the tiles overlapping a selection"""
+    grid = grid_shape(shape, chunks)
+    per_axis = [np.unique(positions // chunk).tolist() for positions, chunk in zip(indices, chunks)]
+
+    return [tile_index(coord, grid) for coord in itertools.product(*per_axis)]
+
+
+def assemble(shape: Tuple[int, ...], chunks: Tuple[int, ...], dtype: np.dtype,
+             indices: List[np.ndarray], tiles: Dict[int, bytes]) -> np.ndarray:
+    """Rebuild the selected region of an array from its tiles
+
+    Args:
+        shape (Tuple[int, ...]): Shape of the array
+        chunks (Tuple[int, ...]): Tile size of every axis
+        dtype (np.dtype): Data type of the array
+        indices (List[np.ndarray]): Selected positions of every axis, see `parse_slices`
+        tiles (Dict[int, bytes]): Raw bytes of (at least) the overlapping tiles, by linear index
+
+    Returns:
+        np.ndarray: The selected region
+    """
+    grid = grid_shape(shape, chunks)
+    out = np.empty([len(positions) for positions in indices], dtype=dtype)
+
+    per_axis = [_group_by_tile(positions, chunk) for positions, chunk in zip(indices, chunks)]
+
+    for coord in itertools.product(*[sorted(groups) for groups in per_axis]):
+        region = tile_slices(coord, shape, chunks)
+        tile = np.frombuffer(tiles[tile_index(coord, grid)], dtype=dtype).reshape(
+            [s.stop - s.start for s in region])
+
+        out_index = [_as_index(groups[k][0]) for groups, k in zip(per_axis, coord)]
+        in_tile = [_as_index(groups[k][1]) for groups, k in zip(per_axis, coord)]
+
+        if (all(isinstance(i, slice) for i in out_index + in_tile)):
+            out[tuple(out_index)] = tile[tuple(in_tile)]
+        else:
+            out[np.ix_(*[np.arange(i.start, i.stop) if isinstance(i, slice) else i for i in out_index])] = \
+                tile[np.ix_(*[np.arange(i.start, i.stop) if isinstance(i, slice) else i for i in in_tile])]
+
+    return out
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   codec.py
+@Time    :   2026/10/18 11:03:27
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Compression codecs and filters of stored blobs
+'''
+
+import bz2
+import lzma
+import numpy as np
+import zlib
+
+from typing import Callable, Dict, Tuple
+
+
+def shuffle(data: bytes, itemsize: int) -> bytes:
+    """Byte-shuffle filter, group the n-th byte of every item together.
+
+    Smooth float series have nearly constant high bytes, which compress much better once grouped.
+    """
+    if (itemsize <= 1):
+        return data
+
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    n = len(buffer) // itemsize * itemsize
+
+    return buffer[:n].reshape(-1, itemsize).T.tobytes() + buffer[n:].tobytes()
+
+
+def unshuffle(data: bytes, itemsize: int) -> bytes:
+    """Inverse of `shuffle`"""
+    if (itemsize <= 1):
+        return data
+
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    n = len(buffer) // itemsize * itemsize
+
+    return buffer[:n].reshape(itemsize, -1).T.tobytes() + buffer[n:].tobytes()
+
+
+# name -> (encode, decode), both are called as func(data, itemsize)
+CODECS: Dict[str, Tuple[Callable[[bytes, int], bytes], Callable[[bytes, int], bytes]]] = {
+    "zlib": (lambda data, itemsize: zlib.compress(data), lambda data, itemsize: zlib.decompress(data)),
+    "lzma": (lambda data, itemsize: lzma.compress(data), lambda data, itemsize: lzma.decompress(data)),
+    "bz2": (lambda data, itemsize: bz2.compress(data), lambda data, itemsize: bz2.decompress(data)),
+    "shuffle": (shuffle, unshuffle)
+}
+
+
+def register_codec(name: str,
+                   encode_func: Callable[[bytes, int], bytes],
+                   decode_func: Callable[[bytes, int], bytes]) -> None:
+    """Register a codec
+
+    Args:
+        name (str): The name of codec, must not contain '+'
+        encode_func (Callable[[bytes, int], bytes]): Called as encode_func(data, itemsize)
+        decode_func (Callable[[bytes, int], bytes]): Called as decode_func(data, itemsize)
+    """
+    if ("+" in name):
+        raise ValueError("The name of codec can't contain '+'.")
+
+    CODECS[name] = (encode_func, decode_func)
+
+
+def check_codec(codec: str) -> None:
+    """Raise a ValueError if any codec of a pipeline is not registered"""
+    if (codec is None):
+        return
+
+    for name in codec.split("+"):
+        if (name not in CODECS):
+            raise ValueError(f"Unknown codec {name}, available codecs are {list(CODECS.keys())}.")
+
+
+def encode(data: bytes, codec: str, itemsize: int = 1) -> bytes:
+    """Encode data with a codec pipeline
+
+    Args:
+        data (bytes): The raw data
+        codec (str): Codec names joined by '+', applied from left to right, e.g. "shuffle+zlib". \
+            None means no encoding.
+        itemsize (int, optional): Size of one item of the data, used by filters. Defaults to 1.
+
+    Returns:
+        bytes: The encoded data
+    """
+    if (codec is None):
+        return data
+
+    check_codec(codec)
+    for name in codec.split("+"):
+        data = CODECS[name][0](data, itemsize)
+
+    return data
+
+
+def decode(data: bytes, codec: str, itemsize: int = 1) -> bytes:
+    """Inverse of `encode`"""
+    if (codec is None):
+        return data
+
+    check_codec(codec)
+    for name in reversed(codec.split("+")):
+        data = CODECS[name][1](data, itemsize)
+
+    return data
@@ -8,65 +8,118 @@
 @Desc    :   To read/write packaged data from/into the database
 '''
 
+import ast
+import atexit
 import copy
+import functools
 import io
 import numpy as np
+import os
 import pickle
+import re
+import shutil
 import sqlite3
 import warnings
-
-from typing import Dict, List
-
+import zipfile
+
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple, Union
+
+from . import chunk as chunk_util
+from . import codec as codec_util
+from . import digest as digest_util
+from .cache import CacheInfo, LRUCache
+from .interface import Backend
+from .singleton import singleton
+from .memoize import Memoized
 from .sqlite import SQLite
+from .write_queue import WriteQueue
+
 
+# Separator of key path components inside the `paths` table. The user facing
+# `split_str` may be anything, so a control character keeps the stored form unambiguous.
+PATH_SEP = "\x1f"
 
-def singleton(cls):
-    _instance = {}
+# Target tile size of datasets created by `append_numpy`. Each append rewrites the last partial tile row,
+# so the tiles are small to keep that cost low.
+APPEND_CHUNK_BYTES = 1 << 14
 
-    def inner(task_name):
-        if (cls, task_name) not in _instance:
-            _instance[(cls, task_name)] = cls(task_name)
+# Max number of `?` in one statement, below the limit of old SQLite versions
+SQL_BATCH_SIZE = 900
 
-        return _instance[(cls, task_name)]
-    return inner
+# `UPDATE ... RETURNING` (SQLite 3.35+), ids are then allocated in one statement
+IS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
 
+# Incremental BLOB I/O (Python 3.11+), plain blobs are then streamed instead of copied through bytes
+IS_BLOB_STREAMING = hasattr(sqlite3.Connection, "blobopen")
 
-class ObservableDict(dict):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._observers = []
+# Buffers of pickled objects (e.g. ndarrays) of at least this size are stored out of the pickle stream
+OUT_OF_BAND_BYTES = 1 << 16
 
-    def add_observer(self, observer_func):
-        self._observers.append(observer_func)
+# Size of the pieces written to a streamed blob
+STREAM_BUFFER_SIZE = 1 << 20
 
-    def _notify_observers(self, key, old_value, new_value):
-        for observer in self._observers:
-            observer(self, key, old_value, new_value)
+# Snapshots tried by a load whose sidecar file is removed by a concurrent writer
+READ_ATTEMPTS = 3
 
-    def __setitem__(self, key, value):
-        old_value = self.get(key, None)
-        super().__setitem__(key, value)
-        if old_value != value:
-            self._notify_observers(key, old_value, value)
+NDARRAY_COLUMNS = [
+    "id",
+    "CASE WHEN codec IS NULL THEN NULL ELSE data END" if IS_BLOB_STREAMING else "data",
+    "file", "shape", "dtype", "chunks", "codec", "rowid", "format", "fortran_order"
+]
 
 
 @singleton
-class DataHandler():
-    def __init__(self, task_name: str) -> None:
+class DataHandler(Backend):
+    def __init__(self, task_name: str, sidecar_threshold: int = None, codec: str = None, cache_size: int = 0,
+                 timeout: float = 30.0, is_dedup: bool = True, queue_size: int = 0) -> None:
+        """To read/write packaged data from/into the database
+
+        Args:
+            task_name (str): The name of task, the database file is `{task_name}.db`
+            sidecar_threshold (int, optional): Arrays of at least this many bytes are stored as `.npy` files \
+                next to the database, and only the file name is kept in SQLite. Defaults to None, never.
+            codec (str, optional): Default codec of stored blobs, e.g. "zlib" or "shuffle+zlib", \
+                see `mathtools.db.codec`. Defaults to None, not compressed.
+            cache_size (int, optional): Memory budget in bytes of the LRU cache in front of `load_numpy` and \
+                `load_obj`. Cached ndarrays are returned read-only. Defaults to 0, no cache.
+            timeout (float, optional): Seconds to wait for a database locked by another writer. Defaults to 30.0.
+            is_dedup (bool, optional): Store identical ndarrays and objects once, the keys share the stored data \
+                which is released with its last key. Defaults to True.
+            queue_size (int, optional): Write-behind mode, `save_numpy`, `save_obj`, `append_numpy` and `delete` \
+                queue up to this many writes for a writer thread which commits them in batches, and return at \
+                once. Loads of a queued save are served from the queue, other reads wait for the queue. \
+                Writes inside `batch` run synchronously. See `flush` and `close`. Defaults to 0, synchronous.
+        """
+        codec_util.check_codec(codec)
+
         self.task_name = task_name
+        self.sidecar_threshold = sidecar_threshold
+        self.codec = codec
+        self.cache = LRUCache(cache_size)
+        self.is_dedup = is_dedup
+
+        self.db = self.__init_database(timeout)
+        self.sidecar_dir = f"{os.path.splitext(self.db.database)[0]}.sidecar"
 
-        self.db = self.__init_database()
+        # Other processes may open the same database at the same time
+        with self.db.transaction():
+            self.__init_table()
 
-        self.__init_table()
+            self.__init_config()
+            self.__migrate_data_mapper()
 
-        self.config = self.__init_config()
-        self.config.add_observer(self.__update_config)
+        self.write_queue = None
+        if (queue_size > 0):
+            self.write_queue = WriteQueue(self.db.transaction, queue_size)
+            # Commit the queue before the interpreter exits
+            atexit.register(self.close)
 
-    def __init_database(self) -> 'SQLite':
+    def __init_database(self, timeout: float) -> 'SQLite':
         if (".db" != self.task_name[-3:]):
-            db = SQLite(f"{self.task_name}.db")
+            db = SQLite(f"{self.task_name}.db", timeout=timeout)
         else:
-            db = SQLite(self.task_name)
+            db = SQLite(self.task_name, timeout=timeout)
 
         return db
 
@@ -83,200 +136,1484 @@ class DataHandler():
         if (self.db.is_table_exists("config") is False):
             self.db.create_table("config", ["key", "value"])
 
-    def __init_config(self) -> 'ObservableDict':
-        config = ObservableDict()
+        # paths table, one row per key path
+        if (self.db.is_table_exists("paths") is False):
+            self.db.create_table("paths", ["path", "id", "kind"])
+
+        # chunk table, tiles of chunked ndarrays
+        if (self.db.is_table_exists("chunk") is False):
+            self.db.create_table("chunk", ["id", "idx", "data"])
+
+        # buffer table, out-of-band buffers of pickled objects
+        if (self.db.is_table_exists("buffer") is False):
+            self.db.create_table("buffer", ["id", "idx", "data", "file"])
+
+        # Columns added by later versions
+        for column in ["file", "dtype", "chunks", "codec", "format", "fortran_order"]:
+            self.db.add_column("ndarray", column)
+        self.db.add_column("object", "codec")
+        self.db.add_column("paths", "info")
+        self.db.add_column("object", "buffers")
+        for table in ["ndarray", "object"]:
+            self.db.add_column(table, "hash")
+            self.db.add_column(table, "refcount")
+
+        self.db.create_index("paths_path", "paths", ["path"], is_unique=True)
+        self.db.create_index("ndarray_id", "ndarray", ["id"], is_unique=True)
+        self.db.create_index("object_id", "object", ["id"], is_unique=True)
+        self.db.create_index("chunk_id_idx", "chunk", ["id", "idx"], is_unique=True)
+        self.db.create_index("buffer_id_idx", "buffer", ["id", "idx"], is_unique=True)
+        self.db.create_index("ndarray_hash", "ndarray", ["hash"])
+        self.db.create_index("object_hash", "object", ["hash"])
+
+    def __init_config(self):
+        # The last allocated data id, only read and moved by `__allocate_id`
+        result = self.db.query("config", "WHERE key='data_id_ptr'")[0]
 
-        # Init data mapper
-        config['data_mapper'] = {}
+        if (result.__len__() == 0):
+            self.db.insert("config", {"key": "data_id_ptr", "value": -1})
 
+    def __migrate_data_mapper(self):
+        # Databases written by older versions keep a pickled nested dict in config,
+        # move it into the paths table once and drop it.
         result = self.db.query("config", "WHERE key='data_mapper'")[0]
 
-        if (result.__len__() != 0):
-            pkl_obj = pickle.loads(result[0][1])
-            if (isinstance(pkl_obj, dict)):
-                config['data_mapper'] = pkl_obj
+        if (result.__len__() == 0):
+            return
+
+        data_mapper = pickle.loads(result[0][1])
+
+        rows = []
+
+        def walk(temp_dict: Dict, keys: List[str]):
+            for key, value in temp_dict.items():
+                if (isinstance(value, dict)):
+                    walk(value, keys + [str(key)])
+                else:
+                    rows.append((PATH_SEP.join(keys + [str(key)]), value))
+
+        if (isinstance(data_mapper, dict)):
+            walk(data_mapper, [])
+
+        ndarray_ids = set(row[0] for row in self.db.execute("SELECT id FROM ndarray"))
+
+        with self.db.transaction():
+            self.db.insert_many("paths", ["path", "id", "kind"], [
+                (path, data_id, "ndarray" if data_id in ndarray_ids else "object") for path, data_id in rows
+            ])
+
+            self.db.delete("config", "WHERE key='data_mapper'")
+
+    def __to_path(self, dict_str: str, split_str: str) -> str:
+        keys = dict_str.split(split_str)
+
+        if ('' in keys):
+            raise KeyError("The keys is empty, can't insert the values.")
+
+        return PATH_SEP.join(keys)
+
+    def __get_data_id(self, path: str) -> Tuple[int, str]:
+        result = self.db.execute("SELECT id, kind FROM paths WHERE path=?", (path, ))
+
+        if (len(result) == 0):
+            # Current path is not exists
+            return -1, None
+
+        return result[0]
+
+    def __check_path_conflict(self, path: str, full_path: str):
+        # A leaf can't be the parent of another path, and a parent can't become a leaf
+        keys = path.split(PATH_SEP)
+        parents = [PATH_SEP.join(keys[:i]) for i in range(1, len(keys))]
+
+        if (len(parents) != 0):
+            result = self.db.execute(
+                f"SELECT path FROM paths WHERE path IN ({','.join(['?'] * len(parents))})", tuple(parents))
+            if (len(result) != 0):
+                raise KeyError(f"The path {full_path} conflicts with an existing leaf path.")
+
+        result = self.db.execute(
+            "SELECT path FROM paths WHERE path > ? AND path < ? LIMIT 1",
+            (path + PATH_SEP, path + chr(ord(PATH_SEP) + 1)))
+        if (len(result) != 0):
+            raise KeyError(f"The path {full_path} already has children paths.")
+
+    def __save_data(self, dict_str: str, split_str: str, is_force: bool, table: str,
+                    serialize: Callable[[int], Dict], digest: Callable[[], str] = None, info: str = None):
+        path = self.__to_path(dict_str, split_str)
+
+        try:
+            # The data row, the path row and the id ptr are committed together
+            with self.db.transaction():
+                return self.__save_data_row(path, dict_str, is_force, table, serialize, digest, info)
+        finally:
+            self.cache.invalidate(path)
+
+    def __save_data_row(self, path: str, dict_str: str, is_force: bool, table: str,
+                        serialize: Callable[[int], Dict], digest: Callable[[], str], info: str):
+        data_id, kind = self.__get_data_id(path)
+
+        if (data_id == -1):
+            self.__check_path_conflict(path, dict_str)
+
+        elif (not is_force):
+            warnings.warn(f"The path {dict_str} already exists. \
+                If you want to force update, please set is_force=True.")
+
+            return False
+
+        content_hash = digest() if (self.is_dedup and digest is not None) else None
+
+        if (content_hash is not None and kind == table):
+            result = self.db.execute(f"SELECT hash FROM {table} WHERE id=?", (data_id, ))
+            if (result[0][0] == content_hash):
+                # Force update with the same content, only the info of the path may change
+                self.db.execute("UPDATE paths SET info=? WHERE path=?", (info, path))
+                return True
+
+        new_id = self.__share_data(table, content_hash)
+
+        if (new_id == -1):
+            new_id = self.__allocate_id()
+
+            # The row exists before serializing, so that blobs can be streamed into it
+            self.db.insert(table, {"id": new_id, "hash": content_hash, "refcount": 1})
+            self.db.update(table, serialize(new_id), f"WHERE id={new_id}")
+
+        # The info is kept with the path, the data row may be shared by other paths
+        if (data_id == -1):
+            self.db.insert("paths", {"path": path, "id": new_id, "kind": table, "info": info})
         else:
-            self.db.insert("config", {"key": "data_mapper", "value": pickle.dumps(config['data_mapper'])})
+            self.db.execute("UPDATE paths SET id=?, kind=?, info=? WHERE path=?", (new_id, table, info, path))
+            self.__release_data(data_id, kind)
 
-        # Init data id ptr
-        config['data_id_ptr'] = -1
+        return True
 
-        result = self.db.query("config", "WHERE key='data_id_ptr'")[0]
+    def __allocate_id(self) -> int:
+        # The counter is incremented in the database, other processes may have moved it since it was loaded.
+        # Must be called inside a transaction, which holds the write lock until the id is used.
+        sql = "UPDATE config SET value=CAST(value AS INTEGER) + 1 WHERE key='data_id_ptr'"
 
-        if (result.__len__() != 0):
-            config['data_id_ptr'] = int(result[0][1])
+        if (IS_RETURNING):
+            data_id = self.db.execute(f"{sql} RETURNING value")[0][0]
         else:
-            self.db.insert("config", {"key": "data_id_ptr", "value": config['data_id_ptr']})
+            self.db.execute(sql)
+            data_id = self.db.execute("SELECT value FROM config WHERE key='data_id_ptr'")[0][0]
+
+        return data_id
 
-        return config
+    def __share_data(self, table: str, content_hash: str) -> int:
+        # Reference the stored data with the same content, -1 if there is none
+        if (content_hash is None):
+            return -1
 
-    def __update_config(self, config: ObservableDict, key: str, old_value: object, new_value: object):
-        if (key == "data_mapper"):
-            out = io.BytesIO()
-            pickle.dump(new_value, out)
-            out.seek(0)
-            data = sqlite3.Binary(out.read())
+        result = self.db.execute(f"SELECT id FROM {table} WHERE hash=? LIMIT 1", (content_hash, ))
+        if (len(result) == 0):
+            return -1
 
-            self.db.update("config", {"value": data}, "WHERE key='data_mapper'")
+        self.db.execute(f"UPDATE {table} SET refcount=IFNULL(refcount, 1) + 1 WHERE id=?", (result[0][0], ))
 
+        return result[0][0]
+
+    def __release_data(self, data_id: int, kind: str):
+        # Drop a reference of the stored data, and the data itself with the last reference
+        self.db.execute(f"UPDATE {kind} SET refcount=IFNULL(refcount, 1) - 1 WHERE id=?", (data_id, ))
+
+        if (self.db.execute(f"SELECT refcount FROM {kind} WHERE id=?", (data_id, ))[0][0] > 0):
+            return
+
+        if (kind == "ndarray"):
+            self.__release_ndarray(data_id)
         else:
-            self.db.update("config", {"value": new_value}, f"WHERE key='{key}'")
+            self.__release_object(data_id)
 
-    def __get_data_id(self, temp_dict: Dict, keys: List[str]) -> int:
-        if (keys == ['']):
-            raise KeyError("The keys is empty, can't insert the values.")
+        self.db.delete(kind, f"WHERE id={data_id}")
 
-        key = keys[0]
+    def __load_data(self, path: str, dict_str: str, table: str, columns: List[str]) -> Tuple:
+        data_id, kind = self.__get_data_id(path)
+
+        if (data_id == -1 or kind != table):
+            raise KeyError(f"The path {dict_str} is not exists.")
+
+        result = self.db.execute(f"SELECT {','.join(columns)} FROM {table} WHERE id=?", (data_id, ))
+        assert len(result) == 1
 
-        if (key in temp_dict):
-            if (len(keys) > 1):
-                return self.__get_data_id(temp_dict[key], keys[1:])
+        return result[0]
+
+    def __sidecar_path(self, file: str) -> str:
+        return os.path.join(self.sidecar_dir, file)
+
+    def __save_sidecar(self, data_id: int, ndarray: np.ndarray) -> str:
+        return self.__write_sidecar(f"{data_id}.npy", lambda f: np.save(f, ndarray))
+
+    def __write_sidecar(self, file: str, write: Callable[[io.BufferedWriter], None]) -> str:
+        os.makedirs(self.sidecar_dir, exist_ok=True)
+
+        # Write aside and swap, so that memory-mapped views of the old file stay valid
+        tmp_path = self.__sidecar_path(f"{file}.tmp")
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, self.__sidecar_path(file))
+
+        return file
+
+    def __remove_sidecar(self, file: str):
+        # Only once committed, a rolled back transaction still references the file
+        def remove():
+            try:
+                os.remove(self.__sidecar_path(file))
+            except OSError:
+                # e.g. still memory-mapped on Windows, the commit is done so `compact` removes it later
+                pass
+
+        self.db.on_commit(remove)
+
+    def __release_object(self, data_id: int):
+        # Drop the out-of-band buffers and their sidecar files, files still mapped by a load are left to `compact`
+        for file, in self.db.execute("SELECT file FROM buffer WHERE id=? AND file IS NOT NULL", (data_id, )):
+            self.__remove_sidecar(file)
+
+        self.db.delete("buffer", f"WHERE id={data_id}")
+
+    def __release_ndarray(self, data_id: int):
+        # Drop the storage kept outside of the ndarray row: the sidecar file and the tiles
+        result = self.db.execute("SELECT file FROM ndarray WHERE id=?", (data_id, ))
+
+        if (len(result) != 0 and result[0][0] is not None):
+            self.__remove_sidecar(result[0][0])
+
+        self.db.delete("chunk", f"WHERE id={data_id}")
+
+    def __write_blob(self, data_id: int, ndarray: np.ndarray, order: str):
+        # Write the raw buffer straight into the blob, piece by piece
+        self.db.execute("UPDATE ndarray SET data=zeroblob(?) WHERE id=?", (ndarray.nbytes, data_id))
+        rowid = self.db.execute("SELECT rowid FROM ndarray WHERE id=?", (data_id, ))[0][0]
+
+        if (ndarray.size == 0):
+            return
+
+        with self.db.blobopen("ndarray", "data", rowid, is_readonly=False) as blob:
+            for piece in np.nditer(ndarray, flags=["external_loop", "buffered", "zerosize_ok"],
+                                   buffersize=max(STREAM_BUFFER_SIZE // ndarray.itemsize, 1), order=order):
+                blob.write(piece.tobytes("C"))
+
+    def __read_blob(self, rowid: int, ndarray: np.ndarray):
+        # Fill the raw buffer of a new contiguous ndarray from the blob, piece by piece
+        buffer = ndarray.reshape(-1, order="A").view(np.uint8)
+
+        with self.db.blobopen("ndarray", "data", rowid) as blob:
+            for start in range(0, len(buffer), STREAM_BUFFER_SIZE):
+                piece = blob.read(STREAM_BUFFER_SIZE)
+                buffer[start:start + len(piece)] = np.frombuffer(piece, dtype=np.uint8)
+
+    def __save_chunks(self, data_id: int, ndarray: np.ndarray, chunks: Tuple[int, ...], codec: str, start: int = 0):
+        self.db.insert_many("chunk", ["id", "idx", "data"], (
+            (data_id, idx, sqlite3.Binary(codec_util.encode(data, codec, ndarray.itemsize)))
+            for idx, data in chunk_util.iter_tiles(ndarray, chunks, start=start)
+        ))
+
+    def __parse_meta(self, shape: str, dtype: str, chunks: str) -> Tuple:
+        return (ast.literal_eval(shape),
+                np.lib.format.descr_to_dtype(ast.literal_eval(dtype)),
+                None if chunks is None else ast.literal_eval(chunks))
+
+    def __read_npy_header(self, data_id: int) -> Tuple:
+        # Only fetch the header in front of the .npy blob, its length follows the magic and the version
+        header = io.BytesIO(self.db.execute("SELECT SUBSTR(data, 1, 12) FROM ndarray WHERE id=?", (data_id, ))[0][0])
+        version = np.lib.format.read_magic(header)
+        length_size = 2 if version == (1, 0) else 4
+        header_size = header.tell() + length_size + int.from_bytes(header.read(length_size), "little")
+
+        header = io.BytesIO(self.db.execute("SELECT SUBSTR(data, 1, ?) FROM ndarray WHERE id=?",
+                                            (header_size, data_id))[0][0])
+        np.lib.format.read_magic(header)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, _, dtype = read_header(header)
+
+        return shape, dtype
+
+    def __decode_tiles(self, tiles: List[Tuple[int, bytes]], dtype: np.dtype, codec: str) -> Dict[int, bytes]:
+        return {idx: codec_util.decode(data, codec, dtype.itemsize) for idx, data in tiles}
+
+    def __load_chunks(self, data_id: int, shape: Tuple[int, ...], dtype: np.dtype,
+                      chunks: Tuple[int, ...], codec: str, slices) -> 'np.ndarray':
+        indices, int_axes = chunk_util.parse_slices(shape, slices)
+        tile_ids = chunk_util.select_tiles(shape, chunks, indices)
+
+        # Only fetch the overlapping tiles, in batches below the SQLite variables limit
+        tiles = {}
+        for i in range(0, len(tile_ids), SQL_BATCH_SIZE):
+            batch = tile_ids[i:i + SQL_BATCH_SIZE]
+            tiles.update(self.__decode_tiles(self.db.execute(
+                f"SELECT idx, data FROM chunk WHERE id=? AND idx IN ({','.join(['?'] * len(batch))})",
+                (data_id, *batch)), dtype, codec))
+
+        out = chunk_util.assemble(shape, chunks, dtype, indices, tiles)
+
+        return out.reshape([n for axis, n in enumerate(out.shape) if axis not in int_axes])
+
+    @contextmanager
+    def batch(self):
+        """Run all saves inside the block as one transaction with one commit
+
+        Examples:
+            >>> with dataer.batch():
+            ...     for i, snapshot in enumerate(snapshots):
+            ...         dataer.save_numpy(f"snapshots.{i}", snapshot)
+
+        If an exception is raised inside the block, nothing of the block is saved.
+        """
+        self.flush()
+
+        with self.db.transaction():
+            try:
+                yield self
+            except BaseException:
+                # Loads inside the block may have cached data which is rolled back
+                self.cache.clear()
+                raise
+
+    def flush(self) -> None:
+        """Wait until the queued writes are committed, and raise the error of a failed one
+
+        Inside a transaction (e.g. `batch`) of this thread the writer can't commit, so nothing is waited for.
+        """
+        if (self.write_queue is not None and self.db.transaction_depth == 0):
+            self.write_queue.flush()
+
+    def close(self) -> None:
+        """Commit the queued writes, close the connections and forget this handler
+
+        `DataHandler(task_name)` then opens a new handler. This one still works, with synchronous writes
+        and new connections.
+        """
+        if (self.write_queue is not None):
+            write_queue, self.write_queue = self.write_queue, None
+            write_queue.close()
+
+        self.db.close()
+        DataHandler.discard(self.task_name, self)
+
+    def reopen(self) -> None:
+        """Drop the state inherited from the parent process, called in a forked child
+
+        The connections are reopened by `SQLite.reopen`. The writer thread isn't forked, so the queue
+        restarts empty, the writes which the parent hasn't committed yet are left to the parent.
+        """
+        if (self.write_queue is not None):
+            self.write_queue = WriteQueue(self.db.transaction, self.write_queue.queue.maxsize)
+
+        # Its lock may be held by another thread of the parent
+        self.cache = LRUCache(self.cache.max_size)
+
+    def __is_queued(self) -> bool:
+        # Writes of a transaction, which includes the writer thread, are applied at once
+        return self.write_queue is not None and self.db.transaction_depth == 0
+
+    def __queue_write(self, path: str, dict_str: str, is_force: bool, write: Callable[[], object],
+                      data: Tuple[str, object] = (None, None)) -> bool:
+        if (not is_force):
+            # The write must see the earlier writes of the path
+            if (self.write_queue.get(path) is not None):
+                self.write_queue.flush()
+
+            if (self.__get_data_id(path)[0] != -1):
+                warnings.warn(f"The path {dict_str} already exists. \
+                    If you want to force update, please set is_force=True.")
+
+                return False
+
+        self.write_queue.put(path, write, data)
+
+        return True
+
+    def __queued_data(self, path: str, kind: str) -> Tuple[bool, object]:
+        # Data of a queued save of the path, other queued writes of the path are committed first. Inside
+        # a transaction the writer waits for it, so the committed data is read instead.
+        pending = self.write_queue.get(path) if self.write_queue is not None else None
+
+        if (pending is None):
+            return False, None
+
+        if (pending[0] == kind):
+            return True, pending[1]
+
+        self.flush()
+        return False, None
+
+    def cache_info(self) -> CacheInfo:
+        """Counters of the read cache
+
+        Returns:
+            CacheInfo: hits, misses, evictions, count and size (bytes) of the cached data, max_size (bytes)
+        """
+        return self.cache.info()
+
+    def cache_clear(self) -> None:
+        """Drop all cached data"""
+        self.cache.clear()
+
+    def save_numpy(self, dict_str: str, ndarray: np.ndarray, is_force: bool = False, split_str: str = ".",
+                   chunks: Union[int, Sequence] = None, codec: str = ""):
+        """Save a ndarray
+
+        Args:
+            dict_str (str): The key path of the ndarray
+            ndarray (np.ndarray): The ndarray
+            is_force (bool, optional): Overwrite the ndarray if the key path exists. Defaults to False.
+            split_str (str, optional): The separator of key path. Defaults to ".".
+            chunks (int | Sequence, optional): Split the ndarray into tiles of this size along the leading axes \
+                (None or missing axes are not split), so that `load_numpy(..., slices=...)` only reads the \
+                overlapping tiles. Defaults to None, not chunked.
+            codec (str, optional): Codec of the stored blob, see `mathtools.db.codec`. Sidecar files are never \
+                encoded. Defaults to "", the codec of the handler.
+
+        Returns:
+            bool: True if the ndarray is saved
+        """
+        ndarray = np.asanyarray(ndarray)
+
+        codec = self.codec if codec == "" else codec
+        codec_util.check_codec(codec)
+
+        if (self.__is_queued()):
+            # Copy, the caller may change the ndarray before it is written
+            ndarray = ndarray.copy(order="K")
+
+            return self.__queue_write(self.__to_path(dict_str, split_str), dict_str, is_force,
+                                      functools.partial(self.save_numpy, dict_str, ndarray, is_force=is_force,
+                                                        split_str=split_str, chunks=chunks, codec=codec),
+                                      ("ndarray", ndarray))
+
+        if (chunks is not None):
+            if (ndarray.dtype.hasobject):
+                raise ValueError("Chunked storage does not support object arrays.")
+
+            chunks = chunk_util.normalize_chunks(ndarray.shape, chunks)
+
+        is_fortran_order = bool(ndarray.flags.f_contiguous and not ndarray.flags.c_contiguous)
+        is_sidecar = self.sidecar_threshold is not None and ndarray.nbytes >= self.sidecar_threshold
+
+        def serialize(data_id: int):
+            columns = {
+                "data": None,
+                "shape": str(ndarray.shape),
+                "file": None,
+                "dtype": repr(np.lib.format.dtype_to_descr(ndarray.dtype)),
+                "chunks": None if chunks is None else str(chunks),
+                "codec": codec,
+                "format": "raw",
+                "fortran_order": int(is_fortran_order)
+            }
+
+            if (chunks is not None):
+                columns["format"] = "chunked"
+                columns["fortran_order"] = 0
+                self.__save_chunks(data_id, ndarray, chunks, codec)
+
+            elif (is_sidecar):
+                columns["format"] = "npy"
+                columns["file"] = self.__save_sidecar(data_id, ndarray)
+                columns["codec"] = None
+
+            elif (ndarray.dtype.hasobject):
+                # Objects have no raw buffer, keep them pickled in the .npy format
+                out = io.BytesIO()
+                np.save(out, ndarray)
+
+                columns["format"] = "npy"
+                columns["data"] = sqlite3.Binary(codec_util.encode(out.getvalue(), codec, ndarray.itemsize))
+
+            elif (IS_BLOB_STREAMING and codec is None):
+                del columns["data"]
+                self.__write_blob(data_id, ndarray, "F" if is_fortran_order else "C")
+
+            else:
+                data = ndarray.tobytes("F" if is_fortran_order else "C")
+                columns["data"] = sqlite3.Binary(codec_util.encode(data, codec, ndarray.itemsize))
+
+            return columns
+
+        def digest():
+            # Chunked ndarrays can be appended to, so they are never shared. Equal ndarrays stored another way
+            # (e.g. a re-save into a sidecar file, which can be mapped) are not shared either.
+            if (chunks is not None):
+                return None
+
+            layout = f"{'sidecar' if is_sidecar else 'blob'}:{'F' if is_fortran_order else 'C'}"
+            return digest_util.ndarray_digest(ndarray, codec, layout)
+
+        return self.__save_data(dict_str, split_str, is_force, "ndarray", serialize, digest)
+
+    def load_numpy(self, dict_str: str, split_str: str = ".", mmap_mode: str = None, slices=None) -> 'np.ndarray':
+        """Load a ndarray
+
+        Args:
+            dict_str (str): The key path of the ndarray
+            split_str (str, optional): The separator of key path. Defaults to ".".
+            mmap_mode (str, optional): If the ndarray is stored in a sidecar file, memory-map it with this mode \
+                ('r', 'r+', 'c') and return a `np.memmap`. Ignored for ndarrays kept in the database. A file \
+                shared by other keys (see `is_dedup`) is copied before it is mapped with 'r+'. Defaults to None.
+            slices (optional): Only load `ndarray[slices]`, e.g. `np.s_[1000:2000, 3]`. For chunked ndarrays \
+                only the overlapping tiles are read, which requires integers, slices and Ellipsis. Defaults to None.
+
+        Returns:
+            np.ndarray: The ndarray
+        """
+        path = self.__to_path(dict_str, split_str)
+
+        is_queued, ndarray = self.__queued_data(path, "ndarray")
+        if (is_queued):
+            return np.array(ndarray if slices is None else ndarray[slices])
+
+        if (mmap_mode == "r+"):
+            self.__unshare_ndarray(path, dict_str)
+
+        if (self.cache.max_size == 0 or mmap_mode is not None or slices is not None):
+            return self.__load_numpy(path, dict_str, mmap_mode, slices)
+
+        kind, ndarray = self.cache.get(path, (None, None))
+
+        if (kind != "ndarray"):
+            generation = self.cache.generation(path)
+            ndarray = self.__load_numpy(path, dict_str, None, None, is_readonly=True)
+            ndarray.flags.writeable = False
+            self.cache.put(path, ("ndarray", ndarray), ndarray.nbytes, generation)
+
+        return ndarray
+
+    def __unshare_ndarray(self, path: str, dict_str: str):
+        # Writes through a "r+" map change the sidecar file, which then must neither be shared with other
+        # keys nor found by the hash of its old content
+        try:
+            with self.db.transaction():
+                data_id, kind = self.__get_data_id(path)
+
+                if (data_id == -1 or kind != "ndarray"):
+                    raise KeyError(f"The path {dict_str} is not exists.")
+
+                file, refcount = self.db.execute("SELECT file, refcount FROM ndarray WHERE id=?", (data_id, ))[0]
+
+                if (file is None):
+                    # Not mapped
+                    return
+
+                if (refcount is None or refcount <= 1):
+                    self.db.execute("UPDATE ndarray SET hash=NULL WHERE id=?", (data_id, ))
+                    return
+
+                new_id = self.__allocate_id()
+                with open(self.__sidecar_path(file), "rb") as src:
+                    new_file = self.__write_sidecar(f"{new_id}.npy", lambda f: shutil.copyfileobj(src, f))
+
+                self.db.execute(
+                    "INSERT INTO ndarray (id, data, file, shape, dtype, chunks, codec, format, fortran_order, hash, refcount) "
+                    "SELECT ?, data, ?, shape, dtype, chunks, codec, format, fortran_order, NULL, 1 FROM ndarray WHERE id=?",
+                    (new_id, new_file, data_id))
+                self.db.execute("UPDATE paths SET id=? WHERE path=?", (new_id, path))
+                self.__release_data(data_id, kind)
+        finally:
+            self.cache.invalidate(path)
+
+    def __load_numpy(self, path: str, dict_str: str, mmap_mode: str, slices, is_readonly: bool = False) -> 'np.ndarray':
+        return self.__read_snapshot(lambda: self.__decode_ndarray(
+            self.__load_data(path, dict_str, "ndarray", NDARRAY_COLUMNS), mmap_mode, slices, is_readonly))
+
+    def __read_snapshot(self, read: Callable[[], object]) -> object:
+        # The path, the row and the blob are read on one snapshot, a concurrent force-save or delete
+        # can't release the row in between. Only the sidecar files are outside of the snapshot: one
+        # removed by a writer which committed after the snapshot began is read from the next snapshot.
+        for attempt in range(READ_ATTEMPTS):
+            try:
+                with self.db.read_transaction():
+                    return read()
+            except FileNotFoundError:
+                if (attempt == READ_ATTEMPTS - 1 or self.db.transaction_depth != 0):
+                    raise
+
+    def __decode_ndarray(self, row: Tuple, mmap_mode: str, slices, is_readonly: bool = False) -> 'np.ndarray':
+        data_id, data, file, shape, dtype, chunks, codec, rowid, data_format, fortran_order = row
+
+        if (chunks is not None):
+            return self.__load_chunks(data_id, *self.__parse_meta(shape, dtype, chunks), codec, slices)
+
+        if (file is not None):
+            if (slices is None):
+                return np.load(self.__sidecar_path(file), mmap_mode=mmap_mode)
+
+            # Only page in the selected region
+            ndarray = np.load(self.__sidecar_path(file), mmap_mode="r" if mmap_mode is None else mmap_mode)
+            return ndarray[slices] if mmap_mode is not None else np.array(ndarray[slices])
+
+        if (data_format == "raw"):
+            shape, dtype, _ = self.__parse_meta(shape, dtype, None)
+            order = "F" if fortran_order else "C"
+
+            if (data is None):
+                ndarray = np.empty(shape, dtype=dtype, order=order)
+                self.__read_blob(rowid, ndarray)
 
             else:
-                # The last key
-                return temp_dict[key]
+                data = codec_util.decode(data, codec, dtype.itemsize)
+
+                # Zero-copy view of the fetched buffer, which is read-only
+                ndarray = np.frombuffer(data, dtype=dtype).reshape(shape, order=order)
+                if (not is_readonly):
+                    ndarray = ndarray.copy(order="K")
+
+        elif (data is None):
+            # Old .npy blob, read piece by piece into the new ndarray
+            with self.db.blobopen("ndarray", "data", rowid) as blob:
+                ndarray = np.load(blob)
 
         else:
-            # Current key is not in the dict
-            return -1
+            if (codec is not None):
+                data = codec_util.decode(data, codec, np.lib.format.descr_to_dtype(ast.literal_eval(dtype)).itemsize)
 
-    def __check_keys_and_insert(self, temp_dict: Dict, keys: List[str], values: object, full_path: str, is_force):
-        if (keys == ['']):
-            raise KeyError("The keys is empty, can't insert the values.")
+            ndarray = np.load(io.BytesIO(data))
+
+        return ndarray if slices is None else ndarray[slices]
+
+    def append_numpy(self, dict_str: str, rows: np.ndarray, split_str: str = ".",
+                     chunks: Union[int, Sequence] = None, codec: str = ""):
+        """Append rows (along the first axis) to a chunked ndarray, the ndarray is created if not exists.
+
+        Only the new rows and the last partial tile row are written, so the cost of an append doesn't grow
+        with the ndarray, but grows with the tile size along the first axis.
+
+        Args:
+            dict_str (str): The key path of the ndarray
+            rows (np.ndarray): The rows to append, the other axes must match the ndarray
+            split_str (str, optional): The separator of key path. Defaults to ".".
+            chunks (int | Sequence, optional): Tile size of a new ndarray, see `save_numpy`. \
+                Defaults to None, tiles of about `APPEND_CHUNK_BYTES` along the first axis.
+            codec (str, optional): Codec of a new ndarray, see `save_numpy`. Defaults to "", the codec of the handler.
+
+        Returns:
+            bool: True if the rows are appended
+        """
+        rows = np.asanyarray(rows)
+
+        if (rows.ndim == 0):
+            raise ValueError("The rows must have at least one dimension.")
+
+        path = self.__to_path(dict_str, split_str)
+
+        if (self.__is_queued()):
+            return self.__queue_write(path, dict_str, True, functools.partial(
+                self.append_numpy, dict_str, rows.copy(), split_str=split_str, chunks=chunks, codec=codec))
+
+        with self.db.transaction():
+            data_id, kind = self.__get_data_id(path)
+
+            if (data_id == -1):
+                if (chunks is None):
+                    row_nbytes = rows.itemsize * int(np.prod(rows.shape[1:]))
+                    chunks = max(1, APPEND_CHUNK_BYTES // max(row_nbytes, 1))
+
+                return self.save_numpy(dict_str, rows, split_str=split_str, chunks=chunks, codec=codec)
+
+            result = self.db.execute("SELECT shape, dtype, chunks, codec FROM ndarray WHERE id=?", (data_id, ))
+            if (kind != "ndarray" or result[0][2] is None):
+                raise ValueError(f"The path {dict_str} is not a chunked ndarray, can't append to it.")
+
+            shape, dtype, chunks = self.__parse_meta(*result[0][:3])
+            codec = result[0][3]
+
+            if (rows.shape[1:] != shape[1:]):
+                raise ValueError(f"Can't append rows of shape {rows.shape} to an ndarray of shape {shape}.")
+
+            rows = rows.astype(dtype, casting="same_kind", copy=False)
+
+            # Rewrite the last tile row if it is partial, then write the new tile rows
+            band = shape[0] // chunks[0]
+            if (shape[0] % chunks[0] != 0):
+                head = self.__load_chunks(data_id, shape, dtype, chunks, codec, np.s_[band * chunks[0]:])
+                rows = np.concatenate([head, rows])
+
+            band_size = int(np.prod(chunk_util.grid_shape(shape, chunks)[1:]))
+            self.db.execute("DELETE FROM chunk WHERE id=? AND idx>=?", (data_id, band * band_size))
+            self.__save_chunks(data_id, rows, chunks, codec, start=band)
+
+            new_shape = (band * chunks[0] + rows.shape[0], ) + shape[1:]
+            self.db.update("ndarray", {"shape": str(new_shape)}, f"WHERE id={data_id}")
+
+        self.cache.invalidate(path)
+
+        return True
+
+    def iter_numpy(self, dict_str: str, split_str: str = ".") -> Iterator['np.ndarray']:
+        """Iterate over a ndarray tile row by tile row (along the first axis)
+
+        Only one tile row is in memory at a time. A ndarray which is not chunked is yielded as a whole.
+
+        Args:
+            dict_str (str): The key path of the ndarray
+            split_str (str, optional): The separator of key path. Defaults to ".".
+
+        Yields:
+            np.ndarray: Consecutive rows of the ndarray
+        """
+        self.flush()
+
+        data_id, shape, dtype, chunks, codec = self.__load_data(
+            self.__to_path(dict_str, split_str), dict_str, "ndarray", ["id", "shape", "dtype", "chunks", "codec"])
+
+        if (chunks is None):
+            yield self.load_numpy(dict_str, split_str=split_str)
+            return
+
+        shape, dtype, chunks = self.__parse_meta(shape, dtype, chunks)
+        band_size = int(np.prod(chunk_util.grid_shape(shape, chunks)[1:]))
+
+        for band in range(chunk_util.grid_shape(shape, chunks)[0]):
+            tiles = self.__decode_tiles(self.db.execute("SELECT idx, data FROM chunk WHERE id=? AND idx>=? AND idx<?",
+                                                        (data_id, band * band_size, (band + 1) * band_size)),
+                                        dtype, codec)
+
+            indices = [np.arange(band * chunks[0], min((band + 1) * chunks[0], shape[0]))]
+            indices += [np.arange(dim) for dim in shape[1:]]
+
+            yield chunk_util.assemble(shape, chunks, dtype, indices, tiles)
+
+    def delete(self, dict_str: str, split_str: str = ".") -> None:
+        """Delete a ndarray or object
+
+        The stored data is only released when no other key shares it.
+
+        Args:
+            dict_str (str): The key path
+            split_str (str, optional): The separator of key path. Defaults to ".".
+        """
+        path = self.__to_path(dict_str, split_str)
+
+        if (self.__is_queued()):
+            if (self.write_queue.get(path) is None and self.__get_data_id(path)[0] == -1):
+                raise KeyError(f"The path {dict_str} is not exists.")
+
+            self.__queue_write(path, dict_str, True, functools.partial(self.delete, dict_str, split_str=split_str))
+            return
+
+        try:
+            with self.db.transaction():
+                data_id, kind = self.__get_data_id(path)
+
+                if (data_id == -1):
+                    raise KeyError(f"The path {dict_str} is not exists.")
+
+                self.db.execute("DELETE FROM paths WHERE path=?", (path, ))
+                self.__release_data(data_id, kind)
+        finally:
+            self.cache.invalidate(path)
+
+    def delete_tree(self, dict_str: str, split_str: str = ".") -> int:
+        """Delete every ndarray and object under a key path
+
+        Args:
+            dict_str (str): The key path of the subtree
+            split_str (str, optional): The separator of key path. Defaults to ".".
+
+        Returns:
+            int: Number of deleted keys
+        """
+        self.flush()
+
+        prefix = self.__to_path(dict_str, split_str) + PATH_SEP
+
+        with self.db.transaction():
+            rows = self.db.execute("SELECT path, id, kind FROM paths WHERE path >= ? AND path < ?",
+                                   (prefix, prefix[:-1] + chr(ord(PATH_SEP) + 1)))
+
+            if (len(rows) == 0):
+                raise KeyError(f"The path {dict_str} is not exists.")
+
+            try:
+                self.db.execute("DELETE FROM paths WHERE path >= ? AND path < ?",
+                                (prefix, prefix[:-1] + chr(ord(PATH_SEP) + 1)))
+                for _, data_id, kind in rows:
+                    self.__release_data(data_id, kind)
+            finally:
+                for path, _, _ in rows:
+                    self.cache.invalidate(path)
+
+        return len(rows)
+
+    def compact(self, is_full: bool = False) -> int:
+        """Shrink the database file after deletes and overwrites
+
+        Sidecar files which no ndarray refers to (e.g. left by an interrupted save) are removed too.
+
+        Args:
+            is_full (bool, optional): Rebuild the database file with VACUUM, slower but also defragments it. \
+                Defaults to False, only truncate the free pages (databases created before incremental \
+                auto-vacuum get one full VACUUM to switch mode).
+
+        Returns:
+            int: Freed bytes
+        """
+        self.flush()
+
+        freed = 0
+
+        if (os.path.isdir(self.sidecar_dir)):
+            with self.db.transaction():
+                files = {file for file, in self.db.execute(
+                    "SELECT file FROM ndarray WHERE file IS NOT NULL UNION SELECT file FROM buffer WHERE file IS NOT NULL")}
+
+                for file in os.listdir(self.sidecar_dir):
+                    if (file not in files):
+                        size = os.path.getsize(self.__sidecar_path(file))
+                        try:
+                            os.remove(self.__sidecar_path(file))
+                        except OSError:
+                            # Still memory-mapped on Windows, left for the next compact
+                            continue
+                        freed += size
+
+        return freed + self.db.vacuum(is_full)
+
+    def storage_size(self, dict_str: str, split_str: str = ".") -> int:
+        """Stored size of a ndarray or object, after encoding
+
+        Args:
+            dict_str (str): The key path
+            split_str (str, optional): The separator of key path. Defaults to ".".
+
+        Returns:
+            int: Size in bytes of the blob, the tiles or the sidecar file
+        """
+        self.flush()
+
+        path = self.__to_path(dict_str, split_str)
+
+        if (self.__get_data_id(path)[1] == "object"):
+            data_id, size = self.__load_data(path, dict_str, "object", ["id", "LENGTH(data)"])
+
+            for buffer_size, file in self.db.execute("SELECT LENGTH(data), file FROM buffer WHERE id=?", (data_id, )):
+                size += os.path.getsize(self.__sidecar_path(file)) if file is not None else buffer_size
+
+            return size
+
+        data_id, size, file, chunks = self.__load_data(path, dict_str, "ndarray", ["id", "LENGTH(data)", "file", "chunks"])
+
+        if (chunks is not None):
+            return self.db.execute("SELECT IFNULL(SUM(LENGTH(data)), 0) FROM chunk WHERE id=?", (data_id, ))[0][0]
+
+        if (file is not None):
+            return os.path.getsize(self.__sidecar_path(file))
+
+        return size
+
+    def keys(self, pattern: str = None, split_str: str = ".") -> List[str]:
+        """List the stored key paths, only the `paths` index is read
+
+        Examples:
+            >>> dataer.keys("exp*.run?.loss")
+            ['exp1.run1.loss', 'exp1.run2.loss', 'exp2.run1.loss']
 
-        key = keys[0]
+        Args:
+            pattern (str, optional): Shell-style pattern matched component by component (`*`, `?`, `[seq]` \
+                don't cross `split_str`), so it only matches keys with as many components. Defaults to None, all keys.
+            split_str (str, optional): The separator of key path. Defaults to ".".
 
-        if (key in temp_dict):
-            if (len(keys) > 1):
-                return self.__check_keys_and_insert(temp_dict[key], keys[1:], values, full_path, is_force)
+        Returns:
+            List[str]: The sorted key paths
+        """
+        self.flush()
+
+        if (pattern is None):
+            return [key for key, in self.db.execute(
+                "SELECT REPLACE(path, ?, ?) FROM paths ORDER BY path", (PATH_SEP, split_str))]
+
+        # GLOB uses the index for the literal prefix. Every separator of a matching path is taken by one of
+        # the pattern, so with as many components the wildcards can't cross them.
+        components = pattern.split(split_str)
+        glob = PATH_SEP.join(component.replace("[!", "[^") for component in components)
+
+        return [key for key, in self.db.execute(
+            "SELECT REPLACE(path, ?, ?) FROM paths WHERE path GLOB ? "
+            "AND LENGTH(path) - LENGTH(REPLACE(path, ?, '')) = ? ORDER BY path",
+            (PATH_SEP, split_str, glob, PATH_SEP, len(components) - 1))]
+
+    def exists(self, dict_str: str, split_str: str = ".") -> bool:
+        """Whether a ndarray or object is stored at the key path
+
+        Args:
+            dict_str (str): The key path
+            split_str (str, optional): The separator of key path. Defaults to ".".
+
+        Returns:
+            bool: True if the key path is a stored leaf
+        """
+        self.flush()
+
+        return self.__get_data_id(self.__to_path(dict_str, split_str))[0] != -1
+
+    def info(self, dict_str: str, split_str: str = ".") -> Dict[str, object]:
+        """Metadata of a ndarray or object, without loading it
+
+        Args:
+            dict_str (str): The key path
+            split_str (str, optional): The separator of key path. Defaults to ".".
+
+        Returns:
+            Dict[str, object]: `kind` ("ndarray" or "object"), `dtype`, `shape`, `nbytes` (in memory, the stored \
+                pickle and its buffers kept in the database for objects, which have no dtype and shape) and the \
+                `info` string of objects
+        """
+        self.flush()
+
+        path = self.__to_path(dict_str, split_str)
+
+        result = self.db.execute(
+            "SELECT paths.kind, paths.id, ndarray.shape, ndarray.dtype, IFNULL(paths.info, object.info), "
+            "LENGTH(object.data) + IFNULL((SELECT SUM(LENGTH(data)) FROM buffer WHERE buffer.id=object.id), 0) FROM paths "
+            "LEFT JOIN ndarray ON paths.kind='ndarray' AND ndarray.id=paths.id "
+            "LEFT JOIN object ON paths.kind='object' AND object.id=paths.id WHERE paths.path=?", (path, ))
+
+        if (len(result) == 0):
+            raise KeyError(f"The path {dict_str} is not exists.")
+
+        kind, data_id, shape, dtype, info, size = result[0]
+
+        if (kind == "object"):
+            return {"kind": kind, "dtype": None, "shape": None, "nbytes": size, "info": info}
+
+        if (dtype is None):
+            # Written by an older version, which kept only the .npy blob
+            shape, dtype = self.__read_npy_header(data_id)
+        else:
+            shape, dtype, _ = self.__parse_meta(shape, dtype, None)
+
+        return {"kind": kind, "dtype": dtype, "shape": shape, "nbytes": int(np.prod(shape)) * dtype.itemsize, "info": None}
+
+    def __fetch_rows(self, table: str, columns: List[str], data_ids: List[int]) -> Dict[int, Tuple]:
+        # id -> row, `id` must be the first column
+        rows = {}
+        for i in range(0, len(data_ids), SQL_BATCH_SIZE):
+            batch = data_ids[i:i + SQL_BATCH_SIZE]
+            for row in self.db.execute(
+                    f"SELECT {','.join(columns)} FROM {table} WHERE id IN ({','.join(['?'] * len(batch))})", tuple(batch)):
+                rows[row[0]] = row
+
+        return rows
+
+    def __load_paths(self, paths: Dict[str, Tuple[int, str]], generation: Tuple[int, int, int]) -> Dict[str, object]:
+        # path -> (id, kind) into path -> data, with one query per table. `generation` of the cache is
+        # taken before the paths are resolved.
+        results = {}
+
+        if (self.cache.max_size > 0):
+            for path, (data_id, kind) in paths.items():
+                cached_kind, data = self.cache.get(path, (None, None))
+                if (cached_kind == kind == "ndarray"):
+                    results[path] = data
+                elif (cached_kind == kind == "object"):
+                    results[path] = self.__unpickle(*data)
+
+        ndarray_ids = [data_id for path, (data_id, kind) in paths.items() if kind == "ndarray" and path not in results]
+        object_ids = [data_id for path, (data_id, kind) in paths.items() if kind == "object" and path not in results]
+
+        ndarray_rows = self.__fetch_rows("ndarray", NDARRAY_COLUMNS, ndarray_ids)
+        object_rows = self.__fetch_rows("object", ["id", "data", "codec", "buffers"], object_ids)
+        buffer_rows = self.__fetch_buffers([row[0] for row in object_rows.values() if row[3]])
+
+        for path, (data_id, kind) in paths.items():
+            if (path in results):
+                continue
+
+            if (kind == "ndarray"):
+                ndarray = self.__decode_ndarray(ndarray_rows[data_id], None, None, is_readonly=self.cache.max_size > 0)
+
+                if (self.cache.max_size > 0):
+                    ndarray.flags.writeable = False
+                    self.cache.put(path, ("ndarray", ndarray), ndarray.nbytes, generation)
+
+                results[path] = ndarray
 
             else:
-                # The last key
-                if (key in temp_dict):
-                    if (not is_force):
-                        warnings.warn(f"The path {full_path} already exists. \
-                            If you want to force update, please set is_force=True.")
+                _, data, codec, _ = object_rows[data_id]
+                data = self.__decode_object(data, codec, buffer_rows.get(data_id, []))
+
+                if (self.cache.max_size > 0):
+                    self.cache.put(path, ("object", data), self.__object_nbytes(data), generation)
+
+                results[path] = self.__unpickle(*data)
+
+        return results
+
+    def load_many(self, dict_strs: List[str], split_str: str = ".") -> Dict[str, object]:
+        """Load many ndarrays and objects at once
+
+        The key paths are resolved in one query, and the data is fetched with one query per table.
+
+        Args:
+            dict_strs (List[str]): The key paths
+            split_str (str, optional): The separator of key path. Defaults to ".".
+
+        Returns:
+            Dict[str, object]: Key path -> ndarray or object
+        """
+        self.flush()
+
+        paths = {self.__to_path(dict_str, split_str): dict_str for dict_str in dict_strs}
+        generation = self.cache.generation()
+
+        def read():
+            resolved = {}
+            path_list = list(paths.keys())
+            for i in range(0, len(path_list), SQL_BATCH_SIZE):
+                batch = path_list[i:i + SQL_BATCH_SIZE]
+                for path, data_id, kind in self.db.execute(
+                        f"SELECT path, id, kind FROM paths WHERE path IN ({','.join(['?'] * len(batch))})", tuple(batch)):
+                    resolved[path] = (data_id, kind)
+
+            for path, dict_str in paths.items():
+                if (path not in resolved):
+                    raise KeyError(f"The path {dict_str} is not exists.")
+
+            return self.__load_paths(resolved, generation)
+
+        results = self.__read_snapshot(read)
+
+        return {dict_str: results[path] for path, dict_str in paths.items()}
+
+    def load_tree(self, dict_str: str = "", split_str: str = ".", is_flat: bool = False) -> Dict[str, object]:
+        """Load every ndarray and object under a key path
+
+        Args:
+            dict_str (str, optional): The key path of the subtree. Defaults to "", the whole database.
+            split_str (str, optional): The separator of key path. Defaults to ".".
+            is_flat (bool, optional): Return a flat mapping of full key paths instead of a nested dict. \
+                Defaults to False.
+
+        Returns:
+            Dict[str, object]: Nested dict of the keys under `dict_str`, e.g. `load_tree("exp1")["run1"]["loss"]`, \
+                or full key path -> data if `is_flat`
+        """
+        self.flush()
+        generation = self.cache.generation()
+
+        prefix = "" if dict_str == "" else self.__to_path(dict_str, split_str) + PATH_SEP
+        prefix_len = len(prefix)
+
+        def read():
+            if (dict_str == ""):
+                rows = self.db.execute("SELECT path, id, kind FROM paths")
+            else:
+                rows = self.db.execute("SELECT path, id, kind FROM paths WHERE path >= ? AND path < ?",
+                                       (prefix, prefix[:-1] + chr(ord(PATH_SEP) + 1)))
+
+                if (len(rows) == 0):
+                    raise KeyError(f"The path {dict_str} is not exists.")
+
+            return self.__load_paths({path: (data_id, kind) for path, data_id, kind in rows}, generation)
+
+        results = self.__read_snapshot(read)
+
+        if (is_flat):
+            return {split_str.join(path.split(PATH_SEP)): data for path, data in results.items()}
+
+        tree = {}
+        for path, data in results.items():
+            keys = path[prefix_len:].split(PATH_SEP)
+
+            node = tree
+            for key in keys[:-1]:
+                node = node.setdefault(key, {})
+            node[keys[-1]] = data
+
+        return tree
+
+    def save_sparse(self, dict_str: str, matrix: object, is_force: bool = False, split_str: str = ".",
+                    codec: str = ""):
+        """Save a scipy.sparse matrix or array
+
+        The components are stored as ndarrays under the key path: `data`, `indices` and `indptr` of CSR/CSC,
+        `data`, `row` and `col` of COO, next to `shape` and `format`. Other formats are stored as CSR.
+
+        Args:
+            dict_str (str): The key path of the matrix
+            matrix (scipy.sparse.spmatrix | scipy.sparse.sparray): The matrix
+            is_force (bool, optional): Overwrite the matrix if the key path exists. Defaults to False.
+            split_str (str, optional): The separator of key path. Defaults to ".".
+            codec (str, optional): Codec of the components, see `save_numpy`. Defaults to "", the codec of the handler.
+
+        Returns:
+            bool: True if the matrix is saved
+        """
+        import scipy.sparse as sp
+
+        if (not sp.issparse(matrix)):
+            raise ValueError(f"Expect a scipy.sparse matrix, got {type(matrix).__name__}.")
+
+        if (matrix.format not in ["csr", "csc", "coo"]):
+            matrix = matrix.tocsr()
+
+        if (matrix.format == "coo"):
+            components = {"data": matrix.data, "row": matrix.row, "col": matrix.col}
+        else:
+            components = {"data": matrix.data, "indices": matrix.indices, "indptr": matrix.indptr}
+
+        components["shape"] = np.array(matrix.shape, dtype=np.int64)
+        # e.g. csr_matrix or csr_array, so that the same class is loaded
+        components["format"] = np.array(type(matrix).__name__)
+
+        path = self.__to_path(dict_str, split_str)
+
+        with self.batch():
+            prefix = path + PATH_SEP
+            if (len(self.db.execute("SELECT path FROM paths WHERE path >= ? AND path < ? LIMIT 1",
+                                    (prefix, path + chr(ord(PATH_SEP) + 1)))) != 0):
+                if (not is_force):
+                    warnings.warn(f"The path {dict_str} already exists. \
+                        If you want to force update, please set is_force=True.")
 
                     return False
 
+                # The components of COO and CSR differ
+                self.delete_tree(dict_str, split_str=split_str)
+
+            for name, component in components.items():
+                self.save_numpy(PATH_SEP.join([path, name]), component, split_str=PATH_SEP, codec=codec)
+
+        return True
+
+    def load_sparse(self, dict_str: str, split_str: str = ".") -> object:
+        """Load a scipy.sparse matrix or array saved by `save_sparse`, straight from its components
+
+        Args:
+            dict_str (str): The key path of the matrix
+            split_str (str, optional): The separator of key path. Defaults to ".".
+
+        Returns:
+            scipy.sparse.spmatrix | scipy.sparse.sparray: The matrix, of the saved class
+        """
+        import scipy.sparse as sp
+
+        components = self.load_tree(dict_str, split_str=split_str)
+
+        if ("format" not in components or "shape" not in components):
+            raise KeyError(f"The path {dict_str} is not a sparse matrix.")
+
+        # Cached components are read-only
+        components = {name: component if component.flags.writeable else component.copy()
+                      for name, component in components.items()}
+
+        name = str(components["format"])
+        if (name not in [f"{fmt}_{kind}" for fmt in ["csr", "csc", "coo"] for kind in ["matrix", "array"]]):
+            raise ValueError(f"Unknown sparse format {name}.")
+
+        cls = getattr(sp, name)
+        shape = tuple(int(dim) for dim in components["shape"])
+
+        if (name.startswith("coo")):
+            return cls((components["data"], (components["row"], components["col"])), shape=shape, copy=False)
+
+        return cls((components["data"], components["indices"], components["indptr"]), shape=shape, copy=False)
+
+    def __file_format(self, file_path: str, format: str) -> str:
+        format = os.path.splitext(file_path)[1][1:].lower() if format is None else format
+
+        if (format not in ["npz", "mat"]):
+            raise ValueError(f"Unknown file format {format}, expect 'npz' or 'mat'.")
+
+        return format
+
+    def export(self, dict_str: str, file_path: str, format: str = None, split_str: str = ".",
+               is_compressed: bool = False) -> int:
+        """Export the ndarrays under a key path to a .npz or .mat file
+
+        The ndarrays are loaded and written one at a time (sidecar files are memory-mapped), so the memory
+        doesn't grow with the subtree. Objects can't be exported and are skipped with a warning.
+
+        Examples:
+            >>> dataer.export("exp1", "exp1.mat")  # exp1.run1.loss -> run1_loss
+
+        Args:
+            dict_str (str): The key path of the subtree, "" for the whole database
+            file_path (str): The path of the file
+            format (str, optional): "npz" (the names are the key paths below `dict_str`) or "mat" (the names \
+                are turned into MATLAB variable names). Defaults to None, from the suffix of `file_path`.
+            split_str (str, optional): The separator of key path. Defaults to ".".
+            is_compressed (bool, optional): Deflate the .npz entries, or compress the .mat variables. \
+                Defaults to False.
+
+        Returns:
+            int: Number of exported ndarrays
+        """
+        self.flush()
+
+        format = self.__file_format(file_path, format)
+
+        if (dict_str == ""):
+            rows = self.db.execute("SELECT path, kind FROM paths ORDER BY path")
+            prefix_len = 0
         else:
-            # Current key is not in the dict
-            if (len(keys) > 1):
-                temp_dict[key] = {}
-                return self.__check_keys_and_insert(temp_dict[key], keys[1:], values, full_path, is_force)
-            else:
-                temp_dict[key] = values
-                return True
+            prefix = self.__to_path(dict_str, split_str) + PATH_SEP
+            rows = self.db.execute("SELECT path, kind FROM paths WHERE path >= ? AND path < ? ORDER BY path",
+                                   (prefix, prefix[:-1] + chr(ord(PATH_SEP) + 1)))
+            prefix_len = len(prefix)
 
-    def save_numpy(self, dict_str: str, ndarray: np.ndarray, is_force: bool = False, split_str: str = "."):
-        keys = dict_str.split(split_str)
+            if (len(rows) == 0):
+                raise KeyError(f"The path {dict_str} is not exists.")
 
-        data_mapper = copy.deepcopy(self.config['data_mapper'])
-        data_id_ptr = self.config['data_id_ptr']
-
-        # Check the key and insert the ndarray id
-        if (self.__check_keys_and_insert(data_mapper, keys, data_id_ptr + 1, dict_str, is_force) is True):
-            # Save the ndarray
-            out = io.BytesIO()
-            np.save(out, ndarray)
-            out.seek(0)
-            data = sqlite3.Binary(out.read())
-
-            self.db.insert("ndarray", {
-                "id": data_id_ptr + 1,
-                "data": data,
-                "shape": str(ndarray.shape)
-            })
-
-            # Update mapper and id_ptr
-            self.config['data_mapper'] = data_mapper
-            self.config['data_id_ptr'] += 1
-
-            return True
-        elif (is_force):
-            # Update the ndarray
-            out = io.BytesIO()
-            np.save(out, ndarray)
-            out.seek(0)
-            data = sqlite3.Binary(out.read())
-
-            self.db.update("ndarray", {
-                "data": data,
-                "shape": str(ndarray.shape)
-            }, f"WHERE id={self.__get_data_id(data_mapper, keys)}")
-
-            return True
-
-    def load_numpy(self, dict_str: str, split_str: str = ".") -> 'np.ndarray':
-        keys = dict_str.split(split_str)
+        skipped = [split_str.join(path.split(PATH_SEP)) for path, kind in rows if kind != "ndarray"]
+        if (len(skipped) != 0):
+            warnings.warn(f"Objects can't be exported, skip {skipped}.")
 
-        data_id = self.__get_data_id(self.config['data_mapper'], keys)
+        def ndarrays() -> Iterator[Tuple[str, np.ndarray]]:
+            for path, kind in rows:
+                if (kind == "ndarray"):
+                    name = split_str.join(path[prefix_len:].split(PATH_SEP))
+                    yield name, self.__load_numpy(path, name, "r", None)
 
-        if (data_id == -1):
-            raise KeyError(f"The path {dict_str} is not exists.")
+        count = 0
 
-        result = self.db.query("ndarray", f"WHERE id={data_id}")[0]
-        assert len(result) == 1
+        if (format == "npz"):
+            with zipfile.ZipFile(file_path, "w", compression=zipfile.ZIP_DEFLATED if is_compressed else zipfile.ZIP_STORED,
+                                 allowZip64=True) as zf:
+                for name, ndarray in ndarrays():
+                    with zf.open(f"{name}.npy", "w", force_zip64=True) as f:
+                        np.lib.format.write_array(f, ndarray, allow_pickle=True)
+                    count += 1
 
-        out = io.BytesIO()
-        out.write(result[0][1])
-        out.seek(0)
-        return np.load(out)
+                    # Free it before the next one is loaded
+                    del ndarray
 
-    def save_obj(self, dict_str: str, obj: object, info: str = "", split_str: str = ".", is_force: bool = False):
-        keys = dict_str.split(split_str)
+            return count
+
+        from ..utils.matlab import save_mat
+
+        names = set()
+
+        def variables() -> Iterator[Tuple[str, np.ndarray]]:
+            nonlocal count
+
+            for name, ndarray in ndarrays():
+                # MATLAB names are letters, digits and underscores, starting with a letter
+                variable = re.sub(r"\W", "_", name)
+                variable = variable if variable[0].isalpha() else f"x{variable}"
 
-        data_mapper = copy.deepcopy(self.config['data_mapper'])
-        data_id_ptr = self.config['data_id_ptr']
-
-        # Check the key and insert the obj id
-        if (self.__check_keys_and_insert(data_mapper, keys, data_id_ptr + 1, dict_str, is_force) is True):
-            # Save the obj
-            out = io.BytesIO()
-            pickle.dump(obj, out)
-            out.seek(0)
-            data = sqlite3.Binary(out.read())
-
-            self.db.insert("object", {
-                "id": data_id_ptr + 1,
-                "data": data,
-                "info": info
-            })
-
-            # Update mapper and id_ptr
-            self.config['data_mapper'] = data_mapper
-            self.config['data_id_ptr'] += 1
-
-            return True
-        elif (is_force):
-            # Update the obj
-            out = io.BytesIO()
-            pickle.dump(obj, out)
-            out.seek(0)
-            data = sqlite3.Binary(out.read())
-
-            self.db.update("object", {
-                "data": data,
-                "info": info
-            }, f"WHERE id={self.__get_data_id(data_mapper, keys)}")
-
-            return True
+                if (variable in names):
+                    raise ValueError(f"The key path {name} is exported as {variable}, which already exists.")
+                names.add(variable)
+
+                yield variable, ndarray
+                count += 1
+
+                del ndarray
+
+        save_mat(file_path, variables(), is_compressed=is_compressed)
+
+        return count
+
+    def import_(self, file_path: str, dict_str: str = "", format: str = None, split_str: str = ".",
+                is_force: bool = False, is_allow_pickle: bool = False) -> int:
+        """Import the arrays of a .npz or .mat file, e.g. written by `export`
+
+        The arrays are read and saved one at a time, all in one transaction.
+
+        Args:
+            file_path (str): The path of the file
+            dict_str (str, optional): The key path to import under, "" for the root. Defaults to "".
+            format (str, optional): "npz" or "mat". Defaults to None, from the suffix of `file_path`.
+            split_str (str, optional): The separator of key path, also splits the names in the file. Defaults to ".".
+            is_force (bool, optional): Overwrite the existing key paths. Defaults to False.
+            is_allow_pickle (bool, optional): Read object ndarrays of a .npz file, which unpickles them and \
+                can run arbitrary code, only for trusted files. Defaults to False, they raise ValueError.
+
+        Returns:
+            int: Number of imported arrays
+        """
+        format = self.__file_format(file_path, format)
+
+        def npz_arrays() -> Iterator[Tuple[str, np.ndarray]]:
+            with zipfile.ZipFile(file_path) as zf:
+                for name in zf.namelist():
+                    if (name.endswith(".npy")):
+                        with zf.open(name) as f:
+                            yield name[:-len(".npy")], np.lib.format.read_array(f, allow_pickle=is_allow_pickle)
+
+        if (format == "npz"):
+            arrays = npz_arrays()
+        else:
+            from ..utils.matlab import iter_mat
+            arrays = iter_mat(file_path)
+
+        count = 0
+
+        with self.batch():
+            for name, ndarray in arrays:
+                key = name if dict_str == "" else split_str.join([dict_str, name])
+                count += bool(self.save_numpy(key, ndarray, is_force=is_force, split_str=split_str))
+
+        return count
+
+    def memoize(self, namespace: str = None, max_size: int = 1 << 26,
+                max_age: float = None) -> Callable[[Callable], 'Memoized']:
+        """Decorator storing the results of a function in the database, keyed by a hash of its arguments
+
+        ndarrays are hashed by content, other arguments by value (pickled if not builtin), so a
+        re-run of a script skips every call whose arguments have not changed. An in-process LRU
+        cache is kept in front of the database.
+
+        Examples:
+            >>> @dataer.memoize(namespace="preprocess", max_age=86400)
+            ... def preprocess(x_data: np.ndarray, order: int = 3):
+            ...     ...
+
+        Args:
+            namespace (str, optional): Namespace of the stored results, change it to invalidate them. \
+                Defaults to None, `module.qualname` of the function.
+            max_size (int, optional): Memory budget in bytes of the in-process cache, 0 disables it. \
+                Cached results are shared between calls, don't mutate them. Defaults to 64 MiB.
+            max_age (float, optional): Results older than this many seconds are recomputed, both in \
+                the cache and in the database. Defaults to None, never expire.
+
+        Returns:
+            Callable[[Callable], Memoized]: The decorator, the decorated function has `cache_info()` and \
+                `cache_clear(is_persistent=False)`
+        """
+        def decorator(func: Callable) -> 'Memoized':
+            return Memoized(self, func, namespace=namespace, max_size=max_size, max_age=max_age)
+
+        return decorator
+
+    def save_obj(self, dict_str: str, obj: object, info: str = "", split_str: str = ".", is_force: bool = False,
+                 codec: str = ""):
+        """Save a picklable object
+
+        The object is pickled with protocol 5. Contiguous buffers of at least `OUT_OF_BAND_BYTES`, such as
+        the data of large ndarrays inside it, are not copied into the pickle but stored as separate blobs,
+        or as sidecar files if they reach `sidecar_threshold`, which `load_obj` maps lazily.
+
+        Args:
+            dict_str (str): The key path of the object
+            obj (object): The object
+            info (str, optional): A description kept next to the object, see `info`. Defaults to "".
+            split_str (str, optional): The separator of key path. Defaults to ".".
+            is_force (bool, optional): Overwrite the object if the key path exists. Defaults to False.
+            codec (str, optional): Codec of the stored pickle and buffers, see `save_numpy`. \
+                Defaults to "", the codec of the handler.
+
+        Returns:
+            bool: True if the object is saved
+        """
+        codec = self.codec if codec == "" else codec
+        codec_util.check_codec(codec)
+
+        if (self.__is_queued()):
+            # Copy, the caller may change the object before it is written
+            obj = copy.deepcopy(obj)
+
+            return self.__queue_write(self.__to_path(dict_str, split_str), dict_str, is_force,
+                                      functools.partial(self.save_obj, dict_str, obj, info=info, split_str=split_str,
+                                                        is_force=is_force, codec=codec),
+                                      ("object", obj))
+
+        pickled = []
+
+        def dumps() -> Tuple[bytes, List[memoryview]]:
+            # Pickle once, for both the hash and the blob. Large buffers are kept out of the stream.
+            if (len(pickled) == 0):
+                buffers = []
+
+                def is_in_band(buffer: pickle.PickleBuffer) -> bool:
+                    try:
+                        raw = buffer.raw()
+                    except BufferError:
+                        # Not contiguous
+                        return True
+
+                    if (raw.nbytes < OUT_OF_BAND_BYTES):
+                        return True
+
+                    buffers.append(raw)
+                    return False
+
+                pickled.append((pickle.dumps(obj, protocol=5, buffer_callback=is_in_band), buffers))
+
+            return pickled[0]
+
+        def serialize(data_id: int):
+            data, buffers = dumps()
+
+            for idx, raw in enumerate(buffers):
+                if (self.sidecar_threshold is not None and raw.nbytes >= self.sidecar_threshold):
+                    file = self.__write_sidecar(f"{data_id}.{idx}.buf", lambda f: f.write(raw))
+                    self.db.insert("buffer", {"id": data_id, "idx": idx, "file": file})
+                else:
+                    self.db.insert("buffer", {"id": data_id, "idx": idx,
+                                              "data": sqlite3.Binary(codec_util.encode(raw, codec))})
+
+            return {
+                "data": sqlite3.Binary(codec_util.encode(data, codec)),
+                "codec": codec,
+                "buffers": len(buffers)
+            }
+
+        def digest():
+            return digest_util.bytes_digest(*dumps(), codec=codec)
+
+        return self.__save_data(dict_str, split_str, is_force, "object", serialize, digest, info)
 
     def load_obj(self, dict_str: str, split_str: str = ".") -> object:
-        keys = dict_str.split(split_str)
+        path = self.__to_path(dict_str, split_str)
 
-        data_id = self.__get_data_id(self.config['data_mapper'], keys)
+        is_queued, obj = self.__queued_data(path, "object")
+        if (is_queued):
+            return copy.deepcopy(obj)
 
-        if (data_id == -1):
-            raise KeyError(f"The path {dict_str} is not exists.")
+        # Objects are mutable, so the cache keeps the pickle and every load gets its own copy
+        kind, data = self.cache.get(path, (None, None)) if self.cache.max_size > 0 else (None, None)
 
-        result = self.db.query("object", f"WHERE id={data_id}")[0]
-        assert len(result) == 1
+        if (kind == "object"):
+            return self.__unpickle(*data)
+
+        generation = self.cache.generation(path)
+
+        def read():
+            data_id, data, codec, buffers = self.__load_data(path, dict_str, "object", ["id", "data", "codec", "buffers"])
+            data = self.__decode_object(data, codec, self.__fetch_buffers([data_id]).get(data_id, []) if buffers else [])
+
+            return data, self.__unpickle(*data)
+
+        data, obj = self.__read_snapshot(read)
+
+        if (self.cache.max_size > 0):
+            self.cache.put(path, ("object", data), self.__object_nbytes(data), generation)
+
+        return obj
+
+    def __fetch_buffers(self, data_ids: List[int]) -> Dict[int, List[Tuple]]:
+        # id -> (data, file) of the out-of-band buffers in order
+        buffers = {}
+        for i in range(0, len(data_ids), SQL_BATCH_SIZE):
+            batch = data_ids[i:i + SQL_BATCH_SIZE]
+            for data_id, data, file in self.db.execute(
+                    f"SELECT id, data, file FROM buffer WHERE id IN ({','.join(['?'] * len(batch))}) ORDER BY id, idx",
+                    tuple(batch)):
+                buffers.setdefault(data_id, []).append((data, file))
+
+        return buffers
+
+    def __decode_object(self, data: bytes, codec: str, buffer_rows: List[Tuple]) -> Tuple[bytes, List]:
+        # The pickle, and each buffer as decoded bytes or the name of its sidecar file
+        return (codec_util.decode(data, codec),
+                [file if file is not None else codec_util.decode(buffer, codec) for buffer, file in buffer_rows])
+
+    def __object_nbytes(self, data: Tuple[bytes, List]) -> int:
+        return len(data[0]) + sum(len(buffer) for buffer in data[1] if isinstance(buffer, bytes))
 
-        out = io.BytesIO()
-        out.write(result[0][1])
-        out.seek(0)
-        return pickle.load(out)
+    def __unpickle(self, data: bytes, buffers: List) -> object:
+        # Writable buffers give writable ndarrays. Sidecar buffers are mapped copy-on-write,
+        # so they are only read when touched and changes stay in memory.
+        return pickle.loads(data, buffers=[
+            bytearray(buffer) if isinstance(buffer, bytes) else
+            np.memmap(self.__sidecar_path(buffer), mode="c") if os.path.getsize(self.__sidecar_path(buffer)) > 0 else
+            bytearray() for buffer in buffers
+        ])
 
     # def save_csv(self):
     #     pass
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   digest.py
+@Time    :   2026/10/18 16:48:03
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Content hashes of stored data
+'''
+
+import hashlib
+import numpy as np
+import pickle
+
+from typing import Sequence
+
+# Size of the pieces hashed from a non-contiguous ndarray
+HASH_BUFFER_SIZE = 1 << 20
+
+
+def new_hash(codec: str = None, layout: str = None) -> 'hashlib.blake2b':
+    """A blake2b hash, salted with the codec and layout so that differently stored data is not shared"""
+    h = hashlib.blake2b(digest_size=32)
+    h.update(repr(codec).encode())
+
+    if (layout is not None):
+        h.update(f"layout{layout}".encode())
+
+    return h
+
+
+def update_ndarray(h: 'hashlib.blake2b', ndarray: np.ndarray) -> None:
+    """Feed the dtype, shape and C-order bytes of a ndarray into a hash
+
+    Equal ndarrays give equal hashes whatever their memory layout.
+    """
+    h.update(repr(np.lib.format.dtype_to_descr(ndarray.dtype)).encode())
+    h.update(repr(ndarray.shape).encode())
+
+    if (ndarray.size == 0):
+        return
+
+    if (ndarray.flags.c_contiguous):
+        h.update(ndarray.reshape(-1).view(np.uint8))
+        return
+
+    for piece in np.nditer(ndarray, flags=["external_loop", "buffered", "zerosize_ok"],
+                           buffersize=max(HASH_BUFFER_SIZE // ndarray.itemsize, 1), order="C"):
+        h.update(piece.tobytes())
+
+
+def ndarray_digest(ndarray: np.ndarray, codec: str = None, layout: str = None) -> str:
+    """Hex blake2b hash of the codec, layout, dtype, shape and bytes of a ndarray, None for object ndarrays
+
+    The layout is how the ndarray is stored, e.g. in a sidecar file, equal ndarrays stored apart differ.
+    """
+    if (ndarray.dtype.hasobject):
+        return None
+
+    h = new_hash(codec, layout)
+    update_ndarray(h, ndarray)
+
+    return h.hexdigest()
+
+
+def bytes_digest(data: bytes, buffers: Sequence = (), codec: str = None) -> str:
+    """Hex blake2b hash of the codec, bytes and the out-of-band buffers of a pickle"""
+    h = new_hash(codec)
+    h.update(data)
+
+    for buffer in buffers:
+        h.update(f"buffer{len(buffer)}".encode())
+        h.update(buffer)
+
+    return h.hexdigest()
+
+
+def update_value(h: 'hashlib.blake2b', value: object) -> None:
+    """Feed a value into a hash, ndarrays by content and containers item by item
+
+    Each value is prefixed with its type, so that e.g. `1`, `1.0` and `"1"` differ. Values of other
+    types are pickled, or hashed by their attributes if they can't be pickled.
+    """
+    if (isinstance(value, np.ndarray) and not value.dtype.hasobject):
+        h.update(b"ndarray")
+        update_ndarray(h, value)
+
+    elif (isinstance(value, np.generic)):
+        h.update(b"generic")
+        update_ndarray(h, np.asarray(value))
+
+    elif (isinstance(value, (list, tuple))):
+        h.update(f"{type(value).__name__}{len(value)}".encode())
+        for item in value:
+            update_value(h, item)
+
+    elif (isinstance(value, dict)):
+        h.update(f"dict{len(value)}".encode())
+        for key, item in value.items():
+            update_value(h, key)
+            update_value(h, item)
+
+    elif (isinstance(value, (set, frozenset))):
+        # The iteration order of strings depends on the hash seed, so the items go in sorted by their hashes
+        h.update(f"{type(value).__name__}{len(value)}".encode())
+        for item_digest in sorted(value_digest(item) for item in value):
+            h.update(item_digest.encode())
+
+    elif (value is None or isinstance(value, (bool, int, float, complex, str, bytes))):
+        h.update(f"{type(value).__name__}{value!r}".encode())
+
+    else:
+        h.update(f"object{type(value).__module__}.{type(value).__qualname__}".encode())
+
+        try:
+            h.update(pickle.dumps(value))
+        except (pickle.PicklingError, AttributeError, TypeError):
+            # e.g. instances of local classes, hash their attributes instead
+            if (not hasattr(value, "__dict__")):
+                raise TypeError(f"Can't hash a value of type {type(value).__qualname__}.")
+
+            update_value(h, vars(value))
+
+
+def value_digest(value: object) -> str:
+    """Hex blake2b hash of a value, see `update_value`"""
+    h = new_hash()
+    update_value(h, value)
+
+    return h.hexdigest()
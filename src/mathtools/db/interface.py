@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   interface.py
+@Time    :   2026/10/18 23:40:12
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Interface of the storage backends
+'''
+
+import abc
+import numpy as np
+
+from typing import List
+
+
+class Backend(abc.ABC):
+    """Interface of a storage backend
+
+    Every backend stores ndarrays and objects under key paths, e.g. "exp1.run1.loss". A key path is
+    either a leaf or the parent of other key paths, never both. `DataHandler` (the "sqlite" backend)
+    implements this interface and many more features, such as chunks, codecs and caches.
+    """
+
+    @abc.abstractmethod
+    def save_numpy(self, dict_str: str, ndarray: np.ndarray, is_force: bool = False, split_str: str = ".") -> bool:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def load_numpy(self, dict_str: str, split_str: str = ".") -> 'np.ndarray':
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def save_obj(self, dict_str: str, obj: object, info: str = "", split_str: str = ".", is_force: bool = False) -> bool:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def load_obj(self, dict_str: str, split_str: str = ".") -> object:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete(self, dict_str: str, split_str: str = ".") -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def keys(self, pattern: str = None, split_str: str = ".") -> List[str]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def exists(self, dict_str: str, split_str: str = ".") -> bool:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        """Release the resources of the backend and forget it, the next open of the task creates a new one"""
+        pass
+
+    def reopen(self) -> None:
+        """Drop the state inherited from the parent process, called in a forked child"""
+        pass
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   memoize.py
+@Time    :   2026/10/18 18:02:37
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Persistent memoization of functions in the task database
+'''
+
+import functools
+import inspect
+import numpy as np
+import pickle
+import time
+
+from typing import TYPE_CHECKING, Callable
+
+from . import digest as digest_util
+from .cache import CacheInfo, LRUCache
+
+if (TYPE_CHECKING):
+    from .data_handler import DataHandler
+
+
+# Separator of the stored key paths, the control character of the `paths` table, so that
+# namespaces (e.g. `module.function`) may contain dots
+KEY_SEP = "\x1f"
+
+# Root of the stored results in the task database
+KEY_ROOT = "__memoize__"
+
+
+class Memoized():
+    def __init__(self, dataer: 'DataHandler', func: Callable, namespace: str = None,
+                 max_size: int = 1 << 26, max_age: float = None) -> None:
+        """A function whose results are stored in the task database, see `DataHandler.memoize`"""
+        self.dataer = dataer
+        self.func = func
+        self.namespace = f"{func.__module__}.{func.__qualname__}" if namespace is None else namespace
+        self.max_age = max_age
+
+        self.signature = inspect.signature(func)
+        self.cache = LRUCache(max_size)
+
+        functools.update_wrapper(self, func)
+
+    def __key(self, args: tuple, kwargs: dict) -> str:
+        # f(1) and f(x=1) are the same call
+        bound = self.signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+
+        return KEY_SEP.join([KEY_ROOT, self.namespace, digest_util.value_digest(dict(sorted(bound.arguments.items())))])
+
+    def __is_expired(self, saved_time: float) -> bool:
+        return self.max_age is not None and time.time() - saved_time > self.max_age
+
+    def __call__(self, *args, **kwargs):
+        key = self.__key(args, kwargs)
+
+        saved_time, result = self.cache.get(key, (None, None))
+        if (saved_time is not None and not self.__is_expired(saved_time)):
+            return result
+
+        try:
+            saved_time = float(self.dataer.info(key, split_str=KEY_SEP)["info"])
+
+            if (not self.__is_expired(saved_time)):
+                result = self.dataer.load_obj(key, split_str=KEY_SEP)
+                self.__cache(key, saved_time, result)
+
+                return result
+        except KeyError:
+            pass
+
+        result = self.func(*args, **kwargs)
+
+        # The time is the info of the key, which a save of an unchanged (shared) result updates too
+        saved_time = time.time()
+        self.dataer.save_obj(key, result, info=repr(saved_time), split_str=KEY_SEP, is_force=True)
+        self.__cache(key, saved_time, result)
+
+        return result
+
+    def __get__(self, instance: object, owner: type):
+        # Decorated methods are bound like functions
+        return self if instance is None else functools.partial(self, instance)
+
+    def __cache(self, key: str, saved_time: float, result: object):
+        if (self.cache.max_size == 0):
+            return
+
+        if (isinstance(result, np.ndarray)):
+            nbytes = result.nbytes
+        else:
+            # Count the buffers of the result without copying them into the pickle
+            buffers = []
+            nbytes = len(pickle.dumps(result, protocol=5, buffer_callback=buffers.append))
+            nbytes += sum(buffer.raw().nbytes for buffer in buffers)
+        self.cache.put(key, (saved_time, result), nbytes)
+
+    def cache_info(self) -> CacheInfo:
+        """Counters of the in-process cache"""
+        return self.cache.info()
+
+    def cache_clear(self, is_persistent: bool = False) -> None:
+        """Drop the in-process cache
+
+        Args:
+            is_persistent (bool, optional): Also delete the results of the namespace from the task database. \
+                Defaults to False.
+        """
+        self.cache.clear()
+
+        if (is_persistent):
+            try:
+                self.dataer.delete_tree(KEY_SEP.join([KEY_ROOT, self.namespace]), split_str=KEY_SEP)
+            except KeyError:
+                pass
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   singleton.py
+@Time    :   2026/10/19 00:12:37
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   One shared instance per name, reopened in a forked child
+'''
+
+import inspect
+import os
+import warnings
+
+
+# Caches of the `singleton` classes, the instances are reopened in a forked child
+_singletons = []
+
+
+def singleton(cls):
+    """Share one instance of the class per name, e.g. a task name or a database file
+
+    The first call creates the instance, later calls of the name return it and warn if they pass
+    other options. Classes must have a `reopen` method, called on every instance in a forked child.
+    """
+    _instance = {}
+    _singletons.append(_instance)
+
+    # The options of each instance, the defaults included
+    _options = {}
+    defaults = {name: parameter.default for name, parameter in inspect.signature(cls).parameters.items()}
+
+    def inner(name, **kwargs):
+        if (cls, name) not in _instance:
+            _instance[(cls, name)] = cls(name, **kwargs)
+            _options[(cls, name)] = {**defaults, **kwargs}
+
+        else:
+            options = _options[(cls, name)]
+            changed = [key for key, value in kwargs.items() if key not in options or options[key] != value]
+
+            if (len(changed) != 0):
+                warnings.warn(f"The handler of {name} is already open, the options {changed} are ignored. \
+                    Close it first to open it with other options.")
+
+        return _instance[(cls, name)]
+
+    def discard(name, instance):
+        """Forget the instance, the next call of the name creates a new one"""
+        if (_instance.get((cls, name)) is instance):
+            del _instance[(cls, name)]
+            del _options[(cls, name)]
+
+    inner.discard = discard
+    return inner
+
+
+def _reopen_after_fork():
+    # In the order the classes were decorated, so connections are reopened before their users
+    for _instance in _singletons:
+        for instance in list(_instance.values()):
+            instance.reopen()
+
+
+if (hasattr(os, "register_at_fork")):
+    os.register_at_fork(after_in_child=_reopen_after_fork)
@@ -9,25 +9,23 @@
 '''
 
 
+import os
 import sqlite3
 import threading
+import time
+import weakref
 
-from typing import Dict, List, Tuple
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
 
-
-def singleton(cls):
-    _instance = {}
-
-    def inner(database):
-        if (cls, database) not in _instance:
-            _instance[(cls, database)] = cls(database)
-
-        return _instance[(cls, database)]
-    return inner
+from .singleton import singleton
 
 
 SQL_DICT = {
     "CreateTable": "CREATE TABLE IF NOT EXISTS '{table_name}' ({columns})",
+    "CreateIndex": "CREATE {unique}INDEX IF NOT EXISTS '{index_name}' ON '{table_name}' ({columns})",
+    "AddColumn": "ALTER TABLE '{table_name}' ADD COLUMN '{column}'",
+    "TableInfo": "PRAGMA table_info('{table_name}')",
     "CheckTableExists": "SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}'",
     "InsertData": "INSERT INTO '{table_name}' ({columns}) VALUES ({values})",
     "SelectData": "SELECT * FROM '{table_name}' {condition}",
@@ -37,19 +35,107 @@ SQL_DICT = {
 }
 
 
+class ThreadSentinel():
+    """Kept in the thread-local data of a thread, so it is collected when the thread exits"""
+
+
 @singleton
 class SQLite():
-    def __init__(self, database: str) -> None:
+    def __init__(self, database: str, timeout: float = 30.0, is_wal: bool = True) -> None:
         """SQLite class
 
+        Every thread gets its own connection, so readers don't wait for each other. In WAL mode
+        they don't wait for the writer either. Writers of this process take turns on `write_lock`,
+        other processes are waited for up to `timeout` seconds.
+
         Args:
             database (str): The name of database
+            timeout (float, optional): Busy timeout in seconds when the database is locked. Defaults to 30.0.
+            is_wal (bool, optional): Use write-ahead logging journal. Defaults to True.
         """
         self.database = database
-        self.db = sqlite3.connect(database, check_same_thread=False)
-        self.cursor = self.db.cursor()
+        self.timeout = timeout
+        self.is_wal = is_wal
+
+        self.local = threading.local()
+        self.connections = []
+        self.connections_lock = threading.Lock()
+        self.write_lock = threading.RLock()
+
+        # Connections inherited from the parent process, see `reopen`
+        self.forked_connections = []
+
+        # Connect once now, so that errors are raised here and the journal mode is set
+        self.db
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        """The connection of current thread"""
+        db = getattr(self.local, "db", None)
+
+        if (db is None):
+            # Autocommit mode, transactions are opened explicitly by `transaction`
+            db = sqlite3.connect(self.database, timeout=self.timeout, check_same_thread=False, isolation_level=None)
+            db.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+            # Lets `vacuum` return free pages cheaply. It only applies to a new database, before its first
+            # page (e.g. of the WAL mode) is written, and takes the write lock, so only set it there.
+            if (db.execute("PRAGMA page_count").fetchone()[0] == 0):
+                self.__retry_busy(db.execute, "PRAGMA auto_vacuum=INCREMENTAL")
+            if (self.is_wal):
+                self.__retry_busy(db.execute, "PRAGMA journal_mode=WAL")
+                db.execute("PRAGMA synchronous=NORMAL")
+
+            self.local.db = db
+            self.local.cursor = db.cursor()
+            self.local.transaction_depth = 0
+            self.local.on_commit = []
+
+            # Close the connection when the thread exits, threads per task would run out of files otherwise
+            self.local.sentinel = ThreadSentinel()
+            weakref.finalize(self.local.sentinel, self.__release_connection, db)
+
+            with self.connections_lock:
+                self.connections.append(db)
+
+        return db
+
+    def __release_connection(self, db: sqlite3.Connection):
+        # Unless `close` or `reopen` took the connection over
+        with self.connections_lock:
+            if (db not in self.connections):
+                return
+
+            self.connections.remove(db)
+
+        db.close()
+
+    @property
+    def cursor(self) -> sqlite3.Cursor:
+        """The cursor of current thread"""
+        self.db
+        return self.local.cursor
+
+    @property
+    def transaction_depth(self) -> int:
+        """Nesting depth of the transaction of current thread"""
+        self.db
+        return self.local.transaction_depth
+
+    def __retry_busy(self, func: Callable, *args):
+        # The busy handler is skipped in some cases, e.g. changing the journal mode while
+        # other processes open the database, so retry with a backoff until `timeout`
+        deadline = time.monotonic() + self.timeout
+        delay = 0.001
+
+        while (True):
+            try:
+                return func(*args)
+            except sqlite3.OperationalError as e:
+                if (("locked" not in str(e) and "busy" not in str(e)) or time.monotonic() + delay > deadline):
+                    raise
 
-        self.lock = threading.Lock()
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
 
     def __format_str(self, datas: List):
         for i, data in enumerate(datas):
@@ -75,6 +161,26 @@ class SQLite():
 
         self.execute(sql)
 
+    def create_index(self, index_name: str, table_name: str, columns: List, is_unique: bool = False):
+        """Create an index on a table if it does not exist
+
+        Args:
+            index_name (str): The name of index
+            table_name (str): The name of table
+            columns (list): list of indexed columns name
+            is_unique (bool, optional): Create a UNIQUE index. Defaults to False.
+        """
+        sql = SQL_DICT['CreateIndex']
+        columns_str = self.__format_str(columns)
+
+        sql = sql.format(
+            unique="UNIQUE " if is_unique else "",
+            index_name=index_name,
+            table_name=table_name,
+            columns=columns_str)
+
+        self.execute(sql)
+
     def is_table_exists(self, table_name: str) -> bool:
         """Check table exists
 
@@ -94,6 +200,35 @@ class SQLite():
 
         return False
 
+    def get_columns(self, table_name: str) -> List[str]:
+        """Get the columns name of a table
+
+        Args:
+            table_name (str): The table name
+
+        Returns:
+            List[str]: list of columns name
+        """
+        sql = SQL_DICT['TableInfo']
+        sql = sql.format(table_name=table_name)
+
+        return [row[1] for row in self.execute(sql)]
+
+    def add_column(self, table_name: str, column: str):
+        """Add a column to table if it does not exist
+
+        Args:
+            table_name (str): The table name
+            column (str): The new column name
+        """
+        if (column in self.get_columns(table_name)):
+            return
+
+        sql = SQL_DICT['AddColumn']
+        sql = sql.format(table_name=table_name, column=column)
+
+        self.execute(sql)
+
     def insert(self, table_name: str, data: Dict):
         """Insert a data to table
 
@@ -113,6 +248,25 @@ class SQLite():
 
         self.execute(sql, values)
 
+    def insert_many(self, table_name: str, columns: List, values: Iterable[Tuple]):
+        """Insert many rows to table with one statement
+
+        Args:
+            table_name (str): The name of you want to inserted table's name
+            columns (list): list of columns name
+            values (Iterable[tuple]): rows of data, in the order of columns
+        """
+        sql = SQL_DICT['InsertData']
+        columns_str = self.__format_str(list(columns))
+        holder_str = ",".join(["?" for i in range(len(columns))])
+
+        sql = sql.format(table_name=table_name,
+                         columns=columns_str,
+                         values=holder_str
+                         )
+
+        self.executemany(sql, values)
+
     def query(self, table_name: str, condition: str = "", is_contain_column_name: bool = False) -> tuple:
         """Query data
 
@@ -130,9 +284,7 @@ class SQLite():
                          condition=condition
                          )
 
-        ret = self.execute(sql, is_column=True)
-        if (ret is not None):
-            results, columns = ret
+        results, columns = self.execute(sql, is_column=True)
 
         if (not is_contain_column_name):
             return (results, )
@@ -187,6 +339,94 @@ class SQLite():
 
         self.execute(sql)
 
+    @contextmanager
+    def transaction(self):
+        """Run all statements inside the block as one transaction with one commit.
+
+        Transactions can be nested, only the outermost one commits. If an exception
+        is raised inside the block, the statements of the block are rolled back and the
+        exception is re-raised. A nested block is a savepoint, so the outer transaction
+        keeps its own statements and may go on.
+        """
+        with self.write_lock:
+            cursor = self.cursor
+            depth = self.local.transaction_depth
+            mark = len(self.local.on_commit)
+
+            if (depth == 0):
+                # Take the write lock of the database at once, instead of failing on the first write
+                self.__retry_busy(cursor.execute, "BEGIN IMMEDIATE")
+            else:
+                cursor.execute(f"SAVEPOINT sp{depth}")
+
+            self.local.transaction_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self.local.transaction_depth -= 1
+                del self.local.on_commit[mark:]
+                # Some errors (e.g. a full disk) already rolled back the whole transaction
+                if (self.db.in_transaction):
+                    if (depth == 0):
+                        cursor.execute("ROLLBACK")
+                    else:
+                        cursor.execute(f"ROLLBACK TO sp{depth}")
+                        cursor.execute(f"RELEASE sp{depth}")
+                raise
+
+            self.local.transaction_depth -= 1
+            if (depth == 0):
+                try:
+                    # A busy COMMIT keeps the transaction open, so it can be retried
+                    self.__retry_busy(cursor.execute, "COMMIT")
+                except BaseException:
+                    self.local.on_commit.clear()
+                    cursor.execute("ROLLBACK")
+                    raise
+
+                funcs, self.local.on_commit = self.local.on_commit, []
+                for func in funcs:
+                    func()
+            else:
+                cursor.execute(f"RELEASE sp{depth}")
+
+    @contextmanager
+    def read_transaction(self):
+        """Run all queries inside the block on one snapshot of the database
+
+        Writers may commit meanwhile, the block doesn't see their changes, so that e.g. a row found by
+        one query is still there for the next one. Inside a transaction (or another read transaction)
+        the block is simply part of it.
+        """
+        if (self.transaction_depth != 0 or self.db.in_transaction):
+            yield self
+            return
+
+        cursor = self.cursor
+        self.__retry_busy(cursor.execute, "BEGIN DEFERRED")
+
+        try:
+            yield self
+        finally:
+            # Nothing was written, so this only ends the snapshot
+            if (self.db.in_transaction):
+                cursor.execute("COMMIT")
+
+    def on_commit(self, func: Callable[[], None]):
+        """Call a function once the transaction of current thread is committed, e.g. to remove files
+        which the committed statements no longer reference
+
+        The function is dropped if the statements before it are rolled back. Outside of a transaction
+        it is called at once.
+
+        Args:
+            func (Callable[[], None]): The function
+        """
+        if (self.transaction_depth == 0):
+            func()
+        else:
+            self.local.on_commit.append(func)
+
     def execute(self, sql: str, data_tuple: Tuple = (), is_column=False) -> List:
         """Execute custom sql
 
@@ -195,24 +435,110 @@ class SQLite():
             is_column (bool, optional): Does the returned query result include column names. Defaults to False.
 
         Returns:
-            List: Returned query results
+            List: Returned query results, errors (e.g. `sqlite3.OperationalError`) are raised
         """
-        with self.lock:
-            try:
-                self.cursor.execute(sql, data_tuple)
+        cursor = self.cursor
+        cursor.execute(sql, data_tuple)
+
+        if (is_column):
+            column_name, _, _, _, _, _, _ = zip(*cursor.description)
+            return [cursor.fetchall(), column_name]
+
+        return cursor.fetchall()
+
+    def executemany(self, sql: str, data_tuples: Iterable[Tuple]) -> None:
+        """Execute custom sql against all parameter tuples in one transaction
+
+        Args:
+            sql (str): sql
+            data_tuples (Iterable[tuple]): parameters of each execution
+        """
+        with self.transaction():
+            self.cursor.executemany(sql, data_tuples)
+
+    def blobopen(self, table_name: str, column: str, row: int, is_readonly: bool = True) -> 'sqlite3.Blob':
+        """Open a BLOB for incremental I/O, requires Python 3.11+
+
+        Args:
+            table_name (str): The name of table
+            column (str): The name of BLOB column
+            row (int): The rowid of the row
+            is_readonly (bool, optional): Open without write permission. Defaults to True.
+
+        Returns:
+            sqlite3.Blob: File-like BLOB handle, its size can't change
+        """
+        return self.db.blobopen(table_name, column, row, readonly=is_readonly)
+
+    def vacuum(self, is_full: bool = False) -> int:
+        """Return the free pages of the database to the file system
+
+        Args:
+            is_full (bool, optional): Rebuild the whole file with VACUUM, which also defragments it. \
+                Otherwise only the free pages are truncated, which falls back to VACUUM if the database \
+                is not in incremental auto-vacuum mode. Defaults to False.
+
+        Returns:
+            int: Bytes the database file shrank by
+        """
+        with self.write_lock:
+            if (self.transaction_depth != 0):
+                raise RuntimeError("Can't vacuum inside a transaction.")
+
+            cursor = self.cursor
+
+            size = self.__file_size()
+
+            if (not is_full and cursor.execute("PRAGMA auto_vacuum").fetchone()[0] == 2):
+                # A cursor steps the pragma once (one page), a script runs it to the end
+                self.db.executescript("PRAGMA incremental_vacuum")
+            else:
+                # Also switches a database created in another mode, the next vacuum is then incremental
+                cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                cursor.execute("VACUUM")
+
+            return size - self.__file_size()
+
+    def __file_size(self) -> int:
+        if (self.is_wal):
+            # Move the WAL into the database file first, so that the file holds every page
+            self.cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+        return os.path.getsize(self.database)
+
+    def reopen(self):
+        """Drop the connections and locks inherited from the parent process, called in a forked child
+
+        The inherited connections must not be used, nor closed: closing their files would release the
+        locks which the new connections of the child hold on the database. Threads of the child open
+        new connections.
+        """
+        self.forked_connections.extend(self.connections)
+
+        self.connections = []
+        self.connections_lock = threading.Lock()
+        self.write_lock = threading.RLock()
+        # Last, dropping the thread-local data releases the connections of the old list
+        self.local = threading.local()
+
+    def close(self):
+        """Close the connections of all threads and forget this instance, `SQLite(database)` creates a new one
+
+        Threads which still use this instance open new connections.
+        """
+        self.__close_connections()
 
-                self.db.commit()
+        SQLite.discard(self.database, self)
 
-                if (is_column):
-                    column_name, _, _, _, _, _, _ = zip(*self.cursor.description)
-                    return [self.cursor.fetchall(), column_name]
+    def __close_connections(self):
+        with self.connections_lock:
+            for db in self.connections:
+                db.close()
 
-                return self.cursor.fetchall()
-            except Exception as e:
-                print(e)
-                self.db.rollback()
+            self.connections.clear()
 
-        return None
+        self.local = threading.local()
 
     def __del__(self):
-        self.db.close()
+        if (hasattr(self, "connections")):
+            self.__close_connections()
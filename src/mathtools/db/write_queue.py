@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   write_queue.py
+@Time    :   2026/10/18 19:24:51
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Write-behind queue of the DataHandler
+'''
+
+import queue
+import threading
+
+from typing import Callable, ContextManager, Dict, Tuple
+
+# Max number of queued writes committed in one transaction
+WRITE_BATCH_SIZE = 256
+
+
+class WriteQueue():
+    def __init__(self, transaction: Callable[[], ContextManager], max_size: int) -> None:
+        """Apply writes on a writer thread, grouped into transactions
+
+        `put` blocks while `max_size` writes are queued, so a producer faster than the disk is slowed
+        down instead of filling the memory. The error of a failed write is raised by the next `put`,
+        `flush` or `close`.
+
+        Args:
+            transaction (Callable[[], ContextManager]): Opens a transaction on the current thread
+            max_size (int): Max number of queued writes
+        """
+        self.transaction = transaction
+
+        self.queue = queue.Queue(max_size)
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.error = None
+
+        # path -> (seq, (kind, data)) of the last queued write of the path, (None, None) if it's not a save
+        self.pending: Dict[str, Tuple[int, Tuple[str, object]]] = {}
+
+        self.thread = threading.Thread(target=self.__run, name="mathtools-db-writer", daemon=True)
+        self.thread.start()
+
+    def put(self, path: str, write: Callable[[], object], data: Tuple[str, object] = (None, None)) -> None:
+        """Queue a write of a path
+
+        Args:
+            path (str): The path written
+            write (Callable[[], object]): Applies the write, called on the writer thread inside a transaction
+            data (Tuple[str, object], optional): Kind and data of a save, served by `get` until it is committed. \
+                Defaults to (None, None), not a save.
+        """
+        self.__raise_error()
+
+        with self.lock:
+            self.seq += 1
+            self.pending[path] = (self.seq, data)
+            seq = self.seq
+
+        self.queue.put((seq, path, write))
+
+    def get(self, path: str) -> Tuple[str, object]:
+        """Kind and data of the last queued write of a path, None if nothing is queued for the path"""
+        with self.lock:
+            pending = self.pending.get(path)
+
+        return None if pending is None else pending[1]
+
+    def flush(self) -> None:
+        """Wait until every queued write is committed"""
+        self.queue.join()
+        self.__raise_error()
+
+    def close(self) -> None:
+        """Commit the queued writes and stop the writer thread"""
+        if (self.thread.is_alive()):
+            self.queue.put(None)
+            self.thread.join()
+
+        self.__raise_error()
+
+    def __raise_error(self):
+        error, self.error = self.error, None
+
+        if (error is not None):
+            raise error
+
+    def __run(self):
+        while (True):
+            items = [self.queue.get()]
+
+            while (len(items) < WRITE_BATCH_SIZE and items[-1] is not None):
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            writes = [item for item in items if item is not None]
+
+            try:
+                with self.transaction():
+                    for _, _, write in writes:
+                        write()
+            except BaseException:
+                # Don't lose the other writes of the batch, retry them one by one
+                for _, _, write in writes:
+                    try:
+                        with self.transaction():
+                            write()
+                    except BaseException as e:
+                        if (self.error is None):
+                            self.error = e
+
+            with self.lock:
+                for seq, path, _ in writes:
+                    if (self.pending[path][0] == seq):
+                        del self.pending[path]
+
+            for _ in items:
+                self.queue.task_done()
+
+            if (items[-1] is None):
+                return
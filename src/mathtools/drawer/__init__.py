@@ -1,7 +1,20 @@
-from .plot import Plot
-from .bar import Bar
-from .heatmap import Heatmap
-from .scatter import Scatter
+from typing import TYPE_CHECKING
+
+from ..utils.lazy import lazy_attrs
+
+# matplotlib is imported with the first drawer used
+__getattr__, __dir__ = lazy_attrs(__name__, {
+    'Plot': '.plot',
+    'Bar': '.bar',
+    'Heatmap': '.heatmap',
+    'Scatter': '.scatter'
+})
+
+if (TYPE_CHECKING):
+    from .plot import Plot
+    from .bar import Bar
+    from .heatmap import Heatmap
+    from .scatter import Scatter
 
 __all__ = [
     'Plot',
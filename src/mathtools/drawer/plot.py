@@ -12,10 +12,6 @@
 import numpy as np
 import matplotlib.pyplot as plt
 
-from mpl_toolkits.axes_grid1.inset_locator import mark_inset
-from scipy.interpolate import make_interp_spline
-from scipy.integrate import simpson
-
 from .. import dataer
 from ..utils.mat_window import rolling_window
 
@@ -105,6 +101,7 @@ class Plot():
         Returns:
             Plot: Return self plot object for chaining
         """
+        from scipy.interpolate import make_interp_spline
 
         keys1 = list(data.keys())
         keys2 = list(self.data.keys())
@@ -201,6 +198,7 @@ class Plot():
         Returns:
             Plot: Return self plot object for chaining
         """
+        from mpl_toolkits.axes_grid1.inset_locator import mark_inset
 
         value_dict = [self.data[label] for label in labels]
 
@@ -238,6 +236,8 @@ class Plot():
     def with_density(self,
                      labels: List[str],
                      density_range: tuple = (0.25, 0.75)) -> 'Plot':
+        from scipy.integrate import simpson
+
         value_dict = [self.data[label] for label in labels]
 
         density_ratios = np.zeros(len(labels))
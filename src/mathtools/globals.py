@@ -8,20 +8,40 @@
 @Desc    :   Global variables
 '''
 
+import contextvars
+
+from contextlib import contextmanager
+from typing import Iterator
+
 from .db.data_handler import DataHandler
 
 
 class Globals:
     _dataer: DataHandler = None
 
+    # The dataer of the current context (thread or asyncio task), set by `scoped_dataer`
+    _context_dataer = contextvars.ContextVar("mathtools_dataer", default=None)
+
     @property
     def dataer(self) -> DataHandler:
-        return self._dataer
+        dataer = self._context_dataer.get()
+
+        return self._dataer if dataer is None else dataer
 
     @dataer.setter
     def dataer(self, value: DataHandler) -> None:
         self._dataer = value
 
+    @contextmanager
+    def scoped_dataer(self, value: DataHandler) -> Iterator[DataHandler]:
+        """Use another dataer in the current context until the block exits"""
+        token = self._context_dataer.set(value)
+
+        try:
+            yield value
+        finally:
+            self._context_dataer.reset(token)
+
 
 _globals = Globals()
 dataer = _globals.dataer
@@ -8,16 +8,50 @@
 @Desc    :   To initialize the library
 '''
 
-import matplotlib as mpl
-
-from typing import Dict
+from contextlib import contextmanager
+from typing import Dict, Iterator
 
 from .globals import _globals
+from .db.backend import Backend, open_backend
 from .db.data_handler import DataHandler
 
 
-def init(task_name: str) -> None:
-    _globals.dataer = DataHandler(task_name)
+def init(task_name: str, backend: str = "sqlite", **kwargs) -> None:
+    """Initialize the global dataer
+
+    Args:
+        task_name (str): The name of task
+        backend (str, optional): Storage backend, "sqlite" (a `DataHandler`), "memory" or "npy", \
+            see `mathtools.db.backend`. Defaults to "sqlite".
+        **kwargs: Options of the backend, e.g. `sidecar_threshold` of the `DataHandler`
+    """
+    _globals.dataer = open_backend(task_name, backend, **kwargs)
+
+
+@contextmanager
+def init_scope(task_name: str, backend: str = "sqlite", **kwargs) -> Iterator[Backend]:
+    """Use the handler of another task as the global dataer, in the current context only
+
+    Inside the block `dataer` refers to the handler of the task in this thread or asyncio task,
+    the others keep theirs, so several tasks can run at once in one process. Outside of any block
+    `dataer` is the handler of `init`.
+
+    Examples:
+        >>> async def run(task_name):
+        ...     with init_scope(task_name):
+        ...         dataer.save_numpy("exp1.loss", await train())
+        >>> await asyncio.gather(run("task1"), run("task2"))
+
+    Args:
+        task_name (str): The name of task
+        backend (str, optional): Storage backend, see `init`. Defaults to "sqlite".
+        **kwargs: Options of the backend
+
+    Yields:
+        Backend: The handler of the task
+    """
+    with _globals.scoped_dataer(open_backend(task_name, backend, **kwargs)) as handler:
+        yield handler
 
 
 def update_mpl_params(parmas: Dict = {
@@ -25,6 +59,8 @@ def update_mpl_params(parmas: Dict = {
     'font.family': 'SimHei',
     'axes.unicode_minus': False
 }) -> None:
+    import matplotlib as mpl
+
     mpl.rcParams.update(parmas)
 
     from aquarel import load_theme
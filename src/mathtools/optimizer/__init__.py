@@ -0,0 +1,9 @@
+from ..utils.lazy import lazy_attrs
+
+__getattr__, __dir__ = lazy_attrs(__name__, {
+    'heuristic': None
+})
+
+__all__ = [
+    'heuristic'
+]
@@ -1,5 +1,15 @@
-from .SA import SA
-from .GA import GA
+from typing import TYPE_CHECKING
+
+from ...utils.lazy import lazy_attrs
+
+__getattr__, __dir__ = lazy_attrs(__name__, {
+    'SA': '.SA',
+    'GA': '.GA'
+})
+
+if (TYPE_CHECKING):
+    from .SA import SA
+    from .GA import GA
 
 __all__ = [
     'SA',
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   lazy.py
+@Time    :   2026/10/18 21:12:40
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Lazy attributes of packages
+'''
+
+import importlib
+import importlib.util
+import types
+
+from typing import Any, Callable, Dict, List, Tuple
+
+
+def lazy_attrs(package: str, attrs: Dict[str, str]) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    """Module `__getattr__` and `__dir__` (PEP 562) which import the attributes of a package on first access
+
+    Usage, in the `__init__.py` of a package:
+
+        __getattr__, __dir__ = lazy_attrs(__name__, {"Plot": ".plot", "db": None})
+
+    Args:
+        package (str): The name of package, i.e. `__name__`
+        attrs (Dict[str, str]): Name of attribute -> the relative name of module which defines it, \
+            None if the attribute is the subpackage (or submodule) of the same name
+
+    Returns:
+        Tuple[Callable[[str], Any], Callable[[], List[str]]]: The `__getattr__` and `__dir__` of the package
+    """
+    module = importlib.import_module(package)
+
+    class LazyModule(types.ModuleType):
+        def __setattr__(self, name: str, value: Any) -> None:
+            # Importing a submodule binds it to the package, e.g. when unpickling, but an attribute defined
+            # in the submodule of the same name (e.g. `SA` of `.SA`) stays the attribute
+            if (isinstance(value, types.ModuleType) and attrs.get(name) is not None
+                    and value.__name__ == importlib.util.resolve_name(attrs[name], package)):
+                value = getattr(value, name)
+
+            super().__setattr__(name, value)
+
+    module.__class__ = LazyModule
+
+    def __getattr__(name: str) -> Any:
+        if (name not in attrs):
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+
+        if (attrs[name] is None):
+            value = importlib.import_module(f".{name}", package)
+        else:
+            value = getattr(importlib.import_module(attrs[name], package), name)
+
+        # Later accesses don't go through `__getattr__`
+        setattr(module, name, value)
+
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(module)) | set(attrs))
+
+    return __getattr__, __dir__
@@ -8,34 +8,243 @@
 @Desc    :   Interacting with MATLAB mat
 '''
 
+import functools
 import numpy as np
 import scipy.io as sio
 
-from typing import Dict
+from collections.abc import Mapping
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Tuple, Union
 
+# mxDOUBLE_CLASS to mxUINT64_CLASS, the classes of MATLAB numeric arrays
+NUMERIC_CLASSES = range(6, 16)
 
-def read_mat(file_path: str) -> Dict[str, np.ndarray]:
+# The data types of the numeric data elements, which are stored as is
+NUMERIC_MDTYPES = [1, 2, 3, 4, 5, 6, 7, 9, 12, 13]
+
+
+def read_mat(file_path: str, variables: List[str] = None, is_lazy: bool = False) -> Mapping[str, np.ndarray]:
     """Read .mat file
 
     Args:
         file_path (str): The path of the .mat file
+        variables (List[str], optional): The names of the variables read, the missing names are ignored. \
+            Defaults to None, every variable.
+        is_lazy (bool, optional): Return a `LazyMat`, which reads each variable when it is first accessed. \
+            Defaults to False.
 
     Returns:
         dict (str, np.ndarray): The data in the .mat file
     """
-    mat_dict = sio.loadmat(file_path)
-    mat_dict.pop("__header__")
-    mat_dict.pop("__version__")
-    mat_dict.pop("__globals__")
+    if (is_lazy):
+        return LazyMat(file_path, variables)
+
+    mat_dict = sio.loadmat(file_path, variable_names=variables)
+    mat_dict.pop("__header__", None)
+    mat_dict.pop("__version__", None)
+    mat_dict.pop("__globals__", None)
 
     return mat_dict
 
 
-def save_mat(file_path: str, data: Dict[str, np.ndarray]) -> None:
+def list_mat(file_path: str) -> List[Tuple[str, Tuple[int, ...], str]]:
+    """List the variables of a .mat file, only the headers are read
+
+    Args:
+        file_path (str): The path of the .mat file
+
+    Returns:
+        List[Tuple[str, Tuple[int, ...], str]]: The name, shape and MATLAB class (e.g. "double") of each variable
+    """
+    return sio.whosmat(file_path)
+
+
+@functools.lru_cache(maxsize=None)
+def _mio5() -> Tuple[object, object]:
+    """The v5 reader/writer module of scipy and its parameters, (None, None) if they can't be imported
+
+    They are private to scipy and may move, so they are imported on first use only, and the public
+    `loadmat` / `savemat` are used without them.
+    """
+    try:
+        from scipy.io.matlab import _mio5, _mio5_params
+    except ImportError:
+        return None, None
+
+    return _mio5, _mio5_params
+
+
+def _is_v5(f: BinaryIO) -> bool:
+    """Is it a v5 file which the v5 reader of scipy can walk"""
+    is_v5 = sio.matlab.matfile_version(f)[0] == 1 and _mio5()[0] is not None
+    f.seek(0)
+
+    return is_v5
+
+
+def _iter_headers(f: BinaryIO) -> Iterator[Tuple[object, object, int, int]]:
+    """Walk the variables of a v5 .mat file
+
+    The stream is left after the header of each variable, where `read_var_array` reads its data.
+
+    Yields:
+        Tuple[MatFile5Reader, object, int, int]: The reader, the header, its position and the position of next variable
+    """
+    reader = _mio5()[0].MatFile5Reader(f)
+    reader.initialize_read()
+    reader.read_file_header()
+
+    while (not reader.end_of_stream()):
+        position = f.tell()
+        header, next_position = reader.read_var_header()
+
+        # Skip the function workspace of MATLAB, like `loadmat` does
+        if (header.name is not None and header.name != b""):
+            yield reader, header, position, next_position
+
+        f.seek(next_position)
+
+
+def _memmap(file_path: str, f: BinaryIO, reader: object, header: object,
+            position: int, next_position: int) -> np.ndarray:
+    """Map the data of a variable, None if it is not a plain numeric array stored uncompressed
+
+    The stream is expected right after the header of the variable, and is left anywhere.
+    """
+    if (header.mclass not in NUMERIC_CLASSES or header.is_logical):
+        return None
+
+    mio5_params = _mio5()[1]
+    data_position = f.tell()
+
+    f.seek(position)
+    if (np.frombuffer(f.read(4), dtype=f"{reader.byte_order}u4")[0] != mio5_params.miMATRIX):
+        return None
+
+    # The tag of the real part, small data elements (<= 4 bytes) pack the byte count in the upper half
+    f.seek(data_position)
+    mdtype, byte_count = (int(value) for value in np.frombuffer(f.read(8), dtype=f"{reader.byte_order}u4"))
+    if (mdtype >> 16 != 0 or mdtype not in NUMERIC_MDTYPES):
+        return None
+
+    dtype = np.dtype(mio5_params.MDTYPES[reader.byte_order]["dtypes"][mdtype])
+    offset = f.tell()
+    shape = tuple(int(dim) for dim in header.dims)
+
+    # An imaginary part follows the (8 bytes aligned) real part of complex arrays
+    if (byte_count == 0 or byte_count != np.prod(shape) * dtype.itemsize
+            or offset + (byte_count + 7) // 8 * 8 < next_position):
+        return None
+
+    return np.memmap(file_path, dtype=dtype, mode="c", offset=offset, shape=shape, order="F")
+
+
+class LazyMat(Mapping):
+    def __init__(self, file_path: str, variables: List[str] = None) -> None:
+        """The variables of a .mat file, each read when it is first accessed and kept afterwards
+
+        Only the headers are read when the mapping is created. Numeric arrays stored uncompressed in v5 files
+        (the default of MATLAB without compression) are memory-mapped instead of read.
+
+        Args:
+            file_path (str): The path of the .mat file
+            variables (List[str], optional): The names of the variables kept, the missing names are ignored. \
+                Defaults to None, every variable.
+        """
+        self.file_path = file_path
+        self.datas: Dict[str, np.ndarray] = {}
+
+        # name -> position of the header in v5 files, None for other versions
+        self.positions: Dict[str, int] = {}
+
+        with open(file_path, "rb") as f:
+            if (_is_v5(f)):
+                for _, header, position, _ in _iter_headers(f):
+                    self.positions[header.name.decode("latin1")] = position
+            else:
+                self.positions = {name: None for name, _, _ in sio.whosmat(file_path)}
+
+        if (variables is not None):
+            self.positions = {name: self.positions[name] for name in variables if name in self.positions}
+
+    def __read(self, name: str) -> np.ndarray:
+        position = self.positions[name]
+
+        if (position is None):
+            return read_mat(self.file_path, [name])[name]
+
+        with open(self.file_path, "rb") as f:
+            reader = _mio5()[0].MatFile5Reader(f)
+            reader.initialize_read()
+
+            f.seek(position)
+            header, next_position = reader.read_var_header()
+            data_position = f.tell()
+
+            data = _memmap(self.file_path, f, reader, header, position, next_position)
+            if (data is None):
+                f.seek(data_position)
+                data = reader.read_var_array(header, True)
+
+        return data
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if (name not in self.datas):
+            self.datas[name] = self.__read(name)
+
+        return self.datas[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.positions)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __repr__(self) -> str:
+        return f"LazyMat({self.file_path!r}, {list(self.positions)})"
+
+
+def iter_mat(file_path: str) -> Iterator[Tuple[str, np.ndarray]]:
+    """Read the variables of a .mat file one at a time
+
+    Only one variable is in memory at a time for v5 (the default of MATLAB) files, other versions
+    (or all files, if the v5 reader of scipy is unavailable) are read as a whole.
+
+    Args:
+        file_path (str): The path of the .mat file
+
+    Yields:
+        Tuple[str, np.ndarray]: The name and data of each variable
+    """
+    with open(file_path, "rb") as f:
+        if (not _is_v5(f)):
+            yield from read_mat(file_path).items()
+            return
+
+        for reader, header, _, _ in _iter_headers(f):
+            data = reader.read_var_array(header, True)
+            yield header.name.decode("latin1"), data
+
+
+def save_mat(file_path: str, data: Union[Dict[str, np.ndarray], Iterable[Tuple[str, np.ndarray]]],
+             is_compressed: bool = False) -> None:
     """Save data to .mat file
 
     Args:
         file_path (str): The path of the .mat file
-        data (dict[str, np.ndarray]): The data to be saved
+        data (dict[str, np.ndarray] | Iterable[Tuple[str, np.ndarray]]): The data to be saved, or (name, data) \
+            pairs, e.g. a generator, which are written one at a time (collected first if the v5 writer of \
+            scipy is unavailable)
+        is_compressed (bool, optional): Compress the variables. Defaults to False.
     """
-    sio.savemat(file_path, data)
+    mio5 = _mio5()[0]
+
+    if (isinstance(data, dict) or mio5 is None):
+        sio.savemat(file_path, dict(data), do_compression=is_compressed)
+        return
+
+    with open(file_path, "wb") as f:
+        writer = mio5.MatFile5Writer(f, do_compression=is_compressed, oned_as="row")
+
+        for name, value in data:
+            # The file header is written with the first variable
+            writer.put_variables({name: value})
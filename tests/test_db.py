@@ -1,3 +1,4 @@
+import os
 import pytest
 
 import numpy as np
@@ -5,6 +6,20 @@ import numpy as np
 from mathtools.db import DataHandler
 
 
+def save_results(args):
+    # Worker of test_processes, every process opens its own handler
+    task_name, worker = args
+    dh = DataHandler(task_name)
+
+    for i in range(20):
+        dh.save_numpy(f"worker{worker}.result{i}", np.full(100, worker * 100 + i))
+        dh.save_numpy(f"worker{worker}.shared{i}", np.arange(i))
+        dh.append_numpy("log", np.array([[worker, i]]))
+    dh.save_obj(f"worker{worker}.config", {"worker": worker})
+
+    return worker
+
+
 class TestDataHandler:
     def test_save_numpy(self, tmpdir):
         test_array = np.random.rand(10, 10)
@@ -56,3 +71,1052 @@ class TestDataHandler:
 
         with pytest.raises(KeyError) as e:
             dh.load_obj("")
+
+    def test_path_conflict(self, tmpdir):
+        dh = DataHandler(str(tmpdir / "test_db"))
+        dh.save_numpy("a.b", np.arange(3))
+
+        with pytest.raises(KeyError):
+            dh.save_numpy("a.b.c", np.arange(3))
+
+        with pytest.raises(KeyError):
+            dh.save_numpy("a", np.arange(3))
+
+        dh.save_obj("a.b", [1, 2], is_force=True)
+        assert [1, 2] == dh.load_obj("a.b")
+
+        with pytest.raises(KeyError):
+            dh.load_numpy("a.b")
+
+        dh.save_numpy("x/y.z", np.arange(4), split_str="/")
+        assert np.array_equal(np.arange(4), dh.load_numpy("x/y.z", split_str="/"))
+
+    def test_migrate_data_mapper(self, tmpdir):
+        import io
+        import pickle
+        import sqlite3
+
+        test_array = np.random.rand(4, 4)
+        out = io.BytesIO()
+        np.save(out, test_array)
+
+        db_path = str(tmpdir / "old_db.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE 'ndarray' ('id','data','shape')")
+        conn.execute("CREATE TABLE 'object' ('id','data','info')")
+        conn.execute("CREATE TABLE 'config' ('key','value')")
+        conn.execute("INSERT INTO ndarray VALUES (?,?,?)", (0, out.getvalue(), str(test_array.shape)))
+        conn.execute("INSERT INTO object VALUES (?,?,?)", (1, pickle.dumps({"k": 1}), ""))
+        conn.execute("INSERT INTO config VALUES (?,?)",
+                     ("data_mapper", pickle.dumps({"exp": {"arr": 0, "obj": 1}})))
+        conn.execute("INSERT INTO config VALUES (?,?)", ("data_id_ptr", 1))
+        conn.commit()
+        conn.close()
+
+        dh = DataHandler(db_path)
+        assert np.array_equal(test_array, dh.load_numpy("exp.arr"))
+        assert {"k": 1} == dh.load_obj("exp.obj")
+        assert {"kind": "ndarray", "dtype": test_array.dtype, "shape": (4, 4), "nbytes": test_array.nbytes,
+                "info": None} == dh.info("exp.arr")
+
+        dh.save_numpy("exp.arr2", test_array)
+        assert np.array_equal(test_array, dh.load_numpy("exp.arr2"))
+        assert 0 == len(dh.db.query("config", "WHERE key='data_mapper'")[0])
+
+        # Errors of the database are raised, also outside of a transaction
+        with pytest.raises(sqlite3.OperationalError):
+            dh.db.execute("SELECT value FROM missing")
+
+    def test_batch(self, tmpdir):
+        dh = DataHandler(str(tmpdir / "test_db"))
+
+        with dh.batch():
+            for i in range(10):
+                dh.save_numpy(f"batch.{i}", np.full(3, i))
+        for i in range(10):
+            assert np.array_equal(np.full(3, i), dh.load_numpy(f"batch.{i}"))
+
+        with pytest.raises(RuntimeError):
+            with dh.batch():
+                dh.save_numpy("rollback.0", np.arange(3))
+                dh.save_obj("rollback.1", "obj")
+                raise RuntimeError("abort")
+
+        with pytest.raises(KeyError):
+            dh.load_numpy("rollback.0")
+        with pytest.raises(KeyError):
+            dh.load_obj("rollback.1")
+
+        dh.save_numpy("rollback.0", np.arange(3))
+        assert np.array_equal(np.arange(3), dh.load_numpy("rollback.0"))
+
+        # A failed save inside a batch leaves nothing behind, the batch goes on
+        dh = DataHandler(str(tmpdir / "test_db_nodedup"), is_dedup=False)
+        with dh.batch():
+            with pytest.raises(Exception):
+                dh.save_obj("bad", lambda: 0)
+            dh.save_obj("good", 1)
+        assert 1 == dh.load_obj("good")
+        assert not dh.exists("bad")
+        assert [(0, )] == dh.db.execute("SELECT id FROM object")
+
+    def test_sidecar(self, tmpdir, monkeypatch):
+        import os
+
+        dh = DataHandler(str(tmpdir / "test_db"), sidecar_threshold=1024)
+        small_array = np.random.rand(4)
+        large_array = np.random.rand(64, 64)
+
+        dh.save_numpy("small", small_array)
+        dh.save_numpy("large", large_array)
+        assert os.listdir(dh.sidecar_dir) == ["1.npy"]
+
+        assert np.array_equal(small_array, dh.load_numpy("small", mmap_mode="r"))
+        mapped = dh.load_numpy("large", mmap_mode="r")
+        assert isinstance(mapped, np.memmap)
+        assert np.array_equal(large_array[10:20], mapped[10:20])
+        assert not isinstance(dh.load_numpy("large"), np.memmap)
+        # Windows can't remove a mapped file
+        del mapped
+
+        large_array2 = np.random.rand(32, 64)
+        dh.save_numpy("large", large_array2, is_force=True)
+        assert np.array_equal(large_array2, dh.load_numpy("large", mmap_mode="r"))
+
+        # The files of a rolled back overwrite or delete are kept
+        for write in [lambda: dh.save_numpy("large", small_array, is_force=True), lambda: dh.delete("large")]:
+            with pytest.raises(RuntimeError):
+                with dh.batch():
+                    write()
+                    raise RuntimeError("abort")
+            assert np.array_equal(large_array2, dh.load_numpy("large"))
+
+        dh.save_numpy("large", small_array, is_force=True)
+        assert np.array_equal(small_array, dh.load_numpy("large"))
+        assert os.listdir(dh.sidecar_dir) == []
+
+        # A file which can't be removed after the commit (e.g. mapped on Windows) is left to `compact`
+        def remove(path):
+            raise PermissionError(path)
+
+        dh.save_numpy("locked", large_array)
+        monkeypatch.setattr(os, "remove", remove)
+        dh.delete("locked")
+        monkeypatch.undo()
+        assert not dh.exists("locked") and len(os.listdir(dh.sidecar_dir)) == 1
+        assert dh.compact() >= large_array.nbytes
+        assert os.listdir(dh.sidecar_dir) == []
+
+    def test_chunked(self, tmpdir):
+        dh = DataHandler(str(tmpdir / "test_db"))
+        test_array = np.random.rand(105, 7, 3)
+
+        dh.save_numpy("chunked", test_array, chunks=(10, 3))
+        assert np.array_equal(test_array, dh.load_numpy("chunked"))
+
+        for slices in [np.s_[12:37], np.s_[::-7, 2], np.s_[5, 1:6:2, -1], np.s_[..., 1], np.s_[40:40], np.s_[-1]]:
+            assert np.array_equal(test_array[slices], dh.load_numpy("chunked", slices=slices))
+
+        with pytest.raises(IndexError):
+            dh.load_numpy("chunked", slices=np.s_[[1, 2]])
+
+        # One row per tile
+        tiles = dh.db.execute("SELECT COUNT(*) FROM chunk")[0][0]
+        assert tiles == 11 * 3
+
+        dh.save_numpy("chunked", test_array[:5], is_force=True)
+        assert dh.db.execute("SELECT COUNT(*) FROM chunk")[0][0] == 0
+        assert np.array_equal(test_array[:5, 1], dh.load_numpy("chunked", slices=np.s_[:, 1]))
+
+        structured = np.zeros(10, dtype=[("a", "<i4"), ("b", "<f8", (2, ))])
+        structured["a"] = np.arange(10)
+        dh.save_numpy("structured", structured, chunks=4)
+        assert np.array_equal(structured[3:9], dh.load_numpy("structured", slices=np.s_[3:9]))
+
+        with pytest.raises(ValueError):
+            dh.save_numpy("objects", np.array([{}, []], dtype=object), chunks=1)
+
+    def test_append_numpy(self, tmpdir, monkeypatch):
+        from mathtools.db import codec, data_handler
+
+        dh = DataHandler(str(tmpdir / "test_db"))
+        records = np.random.rand(23, 2)
+
+        for i in range(0, 23, 5):
+            dh.append_numpy("sa.records", records[i:i + 5], chunks=4)
+        assert np.array_equal(records, dh.load_numpy("sa.records"))
+        assert np.array_equal(records[9:13], dh.load_numpy("sa.records", slices=np.s_[9:13]))
+
+        streamed = list(dh.iter_numpy("sa.records"))
+        assert [4] * 5 + [3] == [len(rows) for rows in streamed]
+        assert np.array_equal(records, np.concatenate(streamed))
+
+        with pytest.raises(ValueError):
+            dh.append_numpy("sa.records", np.random.rand(3, 3))
+
+        dh.save_numpy("sa.plain", records)
+        with pytest.raises(ValueError):
+            dh.append_numpy("sa.plain", records)
+        assert np.array_equal(records, np.concatenate(list(dh.iter_numpy("sa.plain"))))
+
+        dh.append_numpy("sa.Ts", np.array([1.0, 0.99]))
+        dh.append_numpy("sa.Ts", np.array([0.98]))
+        assert np.array_equal([1.0, 0.99, 0.98], dh.load_numpy("sa.Ts"))
+
+        # An append only encodes the last partial tile row, whatever the length of the ndarray
+        encoded = []
+        original_encode = codec.encode
+
+        def encode(data, *args, **kwargs):
+            encoded[-1] += memoryview(data).nbytes
+            return original_encode(data, *args, **kwargs)
+
+        monkeypatch.setattr(codec, "encode", encode)
+        tile_rows = data_handler.APPEND_CHUNK_BYTES // 8
+        with dh.batch():
+            for i in range(3 * tile_rows):
+                encoded.append(0)
+                dh.append_numpy("sa.log", np.array([float(i)]))
+        assert max(encoded[-tile_rows:]) <= max(encoded[:tile_rows]) <= data_handler.APPEND_CHUNK_BYTES
+        assert np.array_equal(np.arange(3 * tile_rows), dh.load_numpy("sa.log"))
+
+    def test_codec(self, tmpdir):
+        from mathtools.db import codec
+
+        series = np.cumsum(np.random.rand(1000)).reshape(100, 10)
+
+        dh = DataHandler(str(tmpdir / "test_db"), codec="shuffle+zlib")
+        dh.save_numpy("default", series)
+        for name in ["zlib", "lzma", "bz2", "shuffle", "shuffle+bz2", None]:
+            dh.save_numpy(f"codec.{name}", series, codec=name)
+            assert np.array_equal(series, dh.load_numpy(f"codec.{name}"))
+        assert np.array_equal(series, dh.load_numpy("default"))
+
+        dh.save_numpy("chunked", series, chunks=7, codec="shuffle+lzma")
+        dh.append_numpy("chunked", series[:3])
+        assert np.array_equal(np.concatenate([series, series[:3]]), dh.load_numpy("chunked"))
+        assert np.array_equal(series[50:60, 3], dh.load_numpy("chunked", slices=np.s_[50:60, 3]))
+
+        dh.save_obj("obj", {"series": series}, codec="bz2")
+        assert np.array_equal(series, dh.load_obj("obj")["series"])
+
+        sizes = dict(dh.db.execute("SELECT codec, LENGTH(data) FROM ndarray WHERE data IS NOT NULL"))
+        assert sizes["shuffle+zlib"] < sizes["zlib"] < sizes[None]
+
+        with pytest.raises(ValueError):
+            dh.save_numpy("unknown", series, codec="unknown")
+
+        codec.register_codec("reverse", lambda data, itemsize: data[::-1], lambda data, itemsize: data[::-1])
+        dh.save_numpy("reverse", series, codec="reverse")
+        assert np.array_equal(series, dh.load_numpy("reverse"))
+        assert series.tobytes() == dh.db.execute("SELECT data FROM ndarray WHERE codec='reverse'")[0][0][::-1]
+
+    def test_cache(self, tmpdir):
+        dh = DataHandler(str(tmpdir / "test_db"), cache_size=1000)
+        test_array = np.random.rand(50)
+
+        dh.save_numpy("a", test_array)
+        dh.save_numpy("b", test_array * 2)
+        dh.save_obj("obj", {"k": [1, 2]})
+
+        loaded = dh.load_numpy("a")
+        assert loaded is dh.load_numpy("a")
+        assert not loaded.flags.writeable
+        with pytest.raises(ValueError):
+            loaded[0] = 1
+        assert (1, 1, 0) == dh.cache_info()[:3]
+
+        # Force-save invalidates the entry
+        dh.save_numpy("a", test_array * 3, is_force=True)
+        assert np.array_equal(test_array * 3, dh.load_numpy("a"))
+
+        # 400 + 400 bytes, the third array evicts the least recently used one
+        dh.load_numpy("b")
+        dh.load_numpy("a")
+        dh.save_numpy("c", test_array)
+        dh.load_numpy("c")
+        info = dh.cache_info()
+        assert 1 == info.evictions and 2 == info.count and 800 == info.size
+
+        obj = dh.load_obj("obj")
+        obj["k"].append(3)
+        assert {"k": [1, 2]} == dh.load_obj("obj")
+
+        dh.cache_clear()
+        assert 0 == dh.cache_info().count
+        assert np.array_equal(test_array, dh.load_numpy("c", slices=np.s_[:]))
+        assert 0 == dh.cache_info().count
+
+        with pytest.raises(RuntimeError):
+            with dh.batch():
+                dh.save_numpy("c", test_array * 4, is_force=True)
+                assert np.array_equal(test_array * 4, dh.load_numpy("c"))
+                raise RuntimeError("abort")
+        assert np.array_equal(test_array, dh.load_numpy("c"))
+
+        # A load racing with a force-save doesn't cache what it read before the save
+        for generation in [dh.cache.generation("c"), dh.cache.generation()]:
+            dh.save_numpy("c", test_array * 5, is_force=True)
+            dh.cache.put("c", ("ndarray", test_array), test_array.nbytes, generation)
+            assert np.array_equal(test_array * 5, dh.load_numpy("c"))
+
+    def test_threads(self, tmpdir):
+        import threading
+
+        dh = DataHandler(str(tmpdir / "test_db"))
+        assert "wal" == dh.db.execute("PRAGMA journal_mode")[0][0]
+
+        for i in range(20):
+            dh.save_numpy(f"read.{i}", np.full(100, i))
+        dh.save_numpy("swap", np.full(1000, -1))
+        dh.save_obj("swap_obj", [-1] * 100)
+
+        errors = []
+
+        def swap_reader():
+            try:
+                for _ in range(200):
+                    assert 1 == len(np.unique(dh.load_numpy("swap")))
+                    assert 1 == len(set(dh.load_obj("swap_obj")))
+                    assert 1 == len(np.unique(dh.load_many(["swap"])["swap"]))
+            except Exception as e:   # pragma: no cover
+                errors.append(e)
+
+        def swapper():
+            try:
+                for k in range(200):
+                    dh.save_numpy("swap", np.full(1000, k), is_force=True)
+                    dh.save_obj("swap_obj", [k] * 100, is_force=True)
+            except Exception as e:   # pragma: no cover
+                errors.append(e)
+
+        def reader():
+            try:
+                for _ in range(5):
+                    for i in range(20):
+                        assert np.array_equal(np.full(100, i), dh.load_numpy(f"read.{i}"))
+            except Exception as e:   # pragma: no cover
+                errors.append(e)
+
+        def writer(n):
+            try:
+                for i in range(20):
+                    dh.save_numpy(f"write.{n}.{i}", np.full(10, i))
+            except Exception as e:   # pragma: no cover
+                errors.append(e)
+
+        threads = [threading.Thread(target=reader) for _ in range(4)]
+        threads += [threading.Thread(target=writer, args=(n, )) for n in range(2)]
+        # A concurrent force-save doesn't release the row a load is reading
+        threads += [threading.Thread(target=swap_reader) for _ in range(4)] + [threading.Thread(target=swapper)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert [] == errors
+        for n in range(2):
+            for i in range(20):
+                assert np.array_equal(np.full(10, i), dh.load_numpy(f"write.{n}.{i}"))
+
+        # The connections of the finished threads are closed
+        assert [dh.db.db] == dh.db.connections
+
+        # A new thread opens its connection while another thread writes
+        results = []
+        with dh.batch():
+            dh.save_numpy("pending", np.arange(3))
+            thread = threading.Thread(target=lambda: results.append(dh.exists("read.0")))
+            thread.start()
+            thread.join()
+        assert [True] == results
+
+    def test_async(self, tmpdir):
+        import asyncio
+
+        from mathtools.db import AsyncDataHandler
+
+        dh = DataHandler(str(tmpdir / "test_db"))
+
+        async def main():
+            async with AsyncDataHandler(dh, max_workers=4) as adh:
+                await asyncio.gather(*[adh.asave_numpy(f"exp.{i}", np.full(10, i)) for i in range(20)])
+                results = await asyncio.gather(*[adh.aload_numpy(f"exp.{i}") for i in range(20)])
+                for i, result in enumerate(results):
+                    assert np.array_equal(np.full(10, i), result)
+
+                # Writes of one key keep their order, and the load sees the last one
+                tasks = [adh.asave_obj("order", i, is_force=True) for i in range(20)]
+                tasks.append(adh.aload_obj("order"))
+                results = await asyncio.gather(*tasks)
+                assert 19 == results[-1]
+
+                await adh.aappend_numpy("append", np.arange(3))
+                await adh.aappend_numpy("append", np.arange(3))
+                assert np.array_equal(np.tile(np.arange(3), 2), await adh.aload_numpy("append"))
+
+                with pytest.raises(KeyError):
+                    await adh.aload_numpy("missing")
+
+        asyncio.run(main())
+
+    def test_load_many_and_tree(self, tmpdir):
+        dh = DataHandler(str(tmpdir / "test_db"), cache_size=1 << 20)
+        datas = {f"exp1.run{i}.loss": np.random.rand(10) for i in range(5)}
+        datas["exp1.run0.chunked"] = np.random.rand(20, 3)
+        datas["exp1.cfg"] = {"lr": 0.1}
+        datas["exp2.loss"] = np.random.rand(3)
+
+        with dh.batch():
+            for key, data in datas.items():
+                if (key == "exp1.cfg"):
+                    dh.save_obj(key, data)
+                elif (key == "exp1.run0.chunked"):
+                    dh.save_numpy(key, data, chunks=6)
+                else:
+                    dh.save_numpy(key, data)
+
+        dh.load_numpy("exp1.run1.loss")
+
+        many = dh.load_many(["exp1.run1.loss", "exp1.cfg", "exp2.loss", "exp1.run0.chunked"])
+        assert ["exp1.run1.loss", "exp1.cfg", "exp2.loss", "exp1.run0.chunked"] == list(many.keys())
+        for key, data in many.items():
+            if (key == "exp1.cfg"):
+                assert data == datas[key]
+            else:
+                assert np.array_equal(datas[key], data)
+
+        tree = dh.load_tree("exp1")
+        assert {"cfg", "run0", "run1", "run2", "run3", "run4"} == set(tree.keys())
+        assert np.array_equal(datas["exp1.run3.loss"], tree["run3"]["loss"])
+        assert np.array_equal(datas["exp1.run0.chunked"], tree["run0"]["chunked"])
+
+        flat = dh.load_tree("exp1", is_flat=True)
+        assert set(key for key in datas if key.startswith("exp1.")) == set(flat.keys())
+        assert set(datas.keys()) == set(dh.load_tree(is_flat=True).keys())
+        assert np.array_equal(datas["exp2.loss"], dh.load_tree()["exp2"]["loss"])
+
+        with pytest.raises(KeyError):
+            dh.load_many(["exp1.cfg", "exp3"])
+        with pytest.raises(KeyError):
+            dh.load_tree("exp3")
+
+    def test_blob_streaming(self, tmpdir):
+        import tracemalloc
+
+        from mathtools.db import data_handler
+
+        dh = DataHandler(str(tmpdir / "test_db"))
+
+        fortran = np.asfortranarray(np.random.rand(30, 20))
+        strided = np.random.rand(40, 30)[::3, ::2]
+        for key, ndarray in [("fortran", fortran), ("strided", strided), ("empty", np.zeros((0, 3))),
+                             ("scalar", np.array(1.5)), ("objects", np.array([{}, None], dtype=object))]:
+            dh.save_numpy(key, ndarray)
+            if (ndarray.dtype.hasobject):
+                with pytest.raises(ValueError):
+                    dh.load_numpy(key)
+            else:
+                loaded = dh.load_numpy(key)
+                assert np.array_equal(ndarray, loaded) and loaded.shape == ndarray.shape
+                assert loaded.flags.writeable
+
+        if (not data_handler.IS_BLOB_STREAMING):  # pragma: no cover
+            return
+
+        large = np.random.rand(1 << 20)
+        tracemalloc.start()
+        dh.save_numpy("large", large)
+        _, save_peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        loaded = dh.load_numpy("large")
+        _, load_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert np.array_equal(large, loaded)
+        assert save_peak < 0.5 * large.nbytes
+        assert load_peak < 1.5 * large.nbytes
+
+    def test_raw_format(self, tmpdir):
+        import io
+
+        dh = DataHandler(str(tmpdir / "test_db"), cache_size=1 << 20)
+        test_array = np.asfortranarray(np.random.rand(20, 30).astype(np.float32))
+
+        dh.save_numpy("raw", test_array)
+        dh.save_numpy("raw_zlib", test_array, codec="zlib")
+        data_format, fortran_order, size = dh.db.execute(
+            "SELECT format, fortran_order, LENGTH(data) FROM ndarray WHERE id=0")[0]
+        assert ("raw", 1, test_array.nbytes) == (data_format, fortran_order, size)
+
+        assert test_array.nbytes == dh.storage_size("raw")
+        assert test_array.nbytes > dh.storage_size("raw_zlib")
+
+        for key in ["raw", "raw_zlib"]:
+            cached = dh.load_numpy(key)
+            assert np.array_equal(test_array, cached) and cached.dtype == np.float32 and cached.flags.f_contiguous
+            assert np.array_equal(test_array[3:5], dh.load_numpy(key, slices=np.s_[3:5]))
+            assert dh.load_numpy(key, slices=np.s_[:]).flags.writeable
+
+        # Old .npy blobs stay readable
+        out = io.BytesIO()
+        np.save(out, test_array + 1)
+        dh.save_numpy("npy", test_array + 1)
+        dh.db.update("ndarray", {"data": out.getvalue(), "format": None}, "WHERE id=2")
+        dh.cache_clear()
+        assert np.array_equal(test_array + 1, dh.load_numpy("npy"))
+
+        dh.save_obj("obj", [1, 2, 3])
+        assert dh.storage_size("obj") > 0
+        dh.save_numpy("chunked", test_array, chunks=7)
+        assert test_array.nbytes == dh.storage_size("chunked")
+
+    def test_dedup(self, tmpdir):
+        dh = DataHandler(str(tmpdir / "test_db"), sidecar_threshold=1 << 12)
+        x_data = np.linspace(0, 1, 100)
+
+        for i in range(3):
+            dh.save_numpy(f"series{i}.x", x_data)
+        dh.save_numpy("series3.x", np.asfortranarray(x_data[None, :].repeat(2, axis=0)))
+        dh.save_numpy("series4.x", x_data[None, :].repeat(2, axis=0))
+        dh.save_numpy("series5.x", x_data, codec="zlib")
+        # Equal ndarrays stored in another order or codec are not shared
+        assert [(3, ), (1, ), (1, ), (1, )] == dh.db.execute("SELECT refcount FROM ndarray ORDER BY refcount DESC")
+
+        dh.delete("series0.x")
+        dh.save_numpy("series1.x", x_data * 2, is_force=True)
+        assert np.array_equal(x_data, dh.load_numpy("series2.x"))
+        assert np.array_equal(x_data * 2, dh.load_numpy("series1.x"))
+        with pytest.raises(KeyError):
+            dh.load_numpy("series0.x")
+        with pytest.raises(KeyError):
+            dh.delete("series0.x")
+
+        dh.delete("series2.x")
+        assert 4 == dh.db.execute("SELECT COUNT(*) FROM ndarray")[0][0]
+
+        # A force-save with the same content but another layout stores it again
+        dh.save_numpy("series5.x", x_data, is_force=True)
+        assert [(None, )] == dh.db.execute("SELECT codec FROM ndarray WHERE id=(SELECT id FROM paths WHERE path=?)",
+                                           ("series5\x1fx", ))
+        relayout = DataHandler(str(tmpdir / "test_relayout"))
+        relayout.save_numpy("x", x_data)
+        relayout.close()
+        relayout = DataHandler(str(tmpdir / "test_relayout"), sidecar_threshold=1)
+        relayout.save_numpy("x", x_data, is_force=True)
+        assert isinstance(relayout.load_numpy("x", mmap_mode="r"), np.memmap)
+
+        # Shared sidecar files are removed with the last key
+        large = np.random.rand(1000)
+        dh.save_numpy("large.a", large)
+        dh.save_numpy("large.b", large)
+        sidecar = dh.db.execute("SELECT file FROM ndarray WHERE refcount=2 AND file IS NOT NULL")[0][0]
+        dh.delete("large.a")
+        assert np.array_equal(large, dh.load_numpy("large.b", mmap_mode="r"))
+        dh.delete("large.b")
+        assert not (tmpdir / "test_db.sidecar" / sidecar).exists()
+
+        # Writes through a "r+" map change only their key, and the changed files are not found by the old content
+        dh.save_numpy("large.c", large)
+        dh.save_numpy("large.d", large)
+        dh.save_numpy("large.e", large * 2)
+        for key in ["large.c", "large.e"]:
+            mapped = dh.load_numpy(key, mmap_mode="r+")
+            mapped[0] = -1
+            mapped.flush()
+            del mapped
+        assert np.array_equal(large, dh.load_numpy("large.d"))
+        assert -1 == dh.load_numpy("large.c")[0] == dh.load_numpy("large.e")[0]
+        dh.save_numpy("large.f", large)
+        dh.save_numpy("large.g", large * 2)
+        assert np.array_equal(large, dh.load_numpy("large.f"))
+        assert np.array_equal(large * 2, dh.load_numpy("large.g"))
+
+        # The info is kept per key, also by a force update with the same content
+        dh.save_obj("obj.a", {"x": x_data}, info="A")
+        dh.save_obj("obj.b", {"x": x_data}, info="B")
+        assert 1 == dh.db.execute("SELECT COUNT(*) FROM object")[0][0]
+        assert ("A", "B") == (dh.info("obj.a")["info"], dh.info("obj.b")["info"])
+        dh.save_obj("obj.b", {"x": x_data}, info="C", is_force=True)
+        assert ("A", "C") == (dh.info("obj.a")["info"], dh.info("obj.b")["info"])
+        dh.save_numpy("obj.a", x_data, is_force=True)
+        assert {"x": x_data}.keys() == dh.load_obj("obj.b").keys()
+
+        undedup = DataHandler(str(tmpdir / "test_undedup"), is_dedup=False)
+        undedup.save_numpy("a", x_data)
+        undedup.save_numpy("b", x_data)
+        assert 2 == undedup.db.execute("SELECT COUNT(*) FROM ndarray")[0][0]
+
+    def test_keys(self, tmpdir):
+        dh = DataHandler(str(tmpdir / "test_db"))
+
+        with dh.batch():
+            for i in range(3):
+                for j in range(2):
+                    dh.save_numpy(f"exp{i}.run{j}.loss", np.random.rand(10, i + 1).astype(np.float32))
+            dh.save_numpy("exp0.run0.x.data", np.arange(5))
+            dh.save_obj("exp0.config", {"lr": 0.1}, info="hyper parameters")
+
+        assert 8 == len(dh.keys())
+        assert ["exp0.run0.loss", "exp0.run1.loss", "exp1.run0.loss"] == dh.keys("exp[01].run?.loss")[:3]
+        assert ["exp1.run0.loss", "exp1.run1.loss"] == dh.keys("exp1.*.loss")
+        assert ["exp0.config"] == dh.keys("exp0.*")
+        assert ["exp0/run0/x/data"] == dh.keys("exp0/*/x/*", split_str="/")
+        assert [] == dh.keys("exp9.*.loss")
+
+        assert dh.exists("exp2.run1.loss")
+        assert not dh.exists("exp2.run1")
+        assert not dh.exists("exp2.run1.loss.x")
+
+        info = dh.info("exp2.run1.loss")
+        assert ("ndarray", np.float32, (10, 3), 120) == (info["kind"], info["dtype"], info["shape"], info["nbytes"])
+        info = dh.info("exp0.config")
+        assert ("object", None, "hyper parameters") == (info["kind"], info["shape"], info["info"])
+        assert info["nbytes"] > 0
+        with pytest.raises(KeyError):
+            dh.info("exp0.missing")
+
+        # Listing only reads the index
+        with dh.db.transaction():
+            dh.db.insert_many("paths", ["path", "id", "kind"],
+                              [(f"bulk\x1f{i}\x1fy", 10 ** 6 + i, "ndarray") for i in range(100_000)])
+        assert 100_000 == len(dh.keys("bulk.*.y"))
+        assert ["exp1.run1.loss"] == dh.keys("exp1.run1.loss")
+
+    def test_compact(self, tmpdir):
+        dh = DataHandler(str(tmpdir / "test_db"), sidecar_threshold=1 << 20)
+
+        with dh.batch():
+            for i in range(20):
+                dh.save_numpy(f"exp.run{i}.x", np.random.rand(20000))
+            dh.save_obj("exp.config", {"lr": 0.1})
+            dh.save_numpy("keep.x", np.random.rand(10))
+            dh.save_numpy("exp.large", np.random.rand(1 << 18))
+        (tmpdir / "test_db.sidecar" / "orphan.npy").write_binary(b"\0" * 1000)
+
+        assert 22 == dh.delete_tree("exp")
+        assert ["keep.x"] == dh.keys()
+        assert 1 == dh.db.execute("SELECT COUNT(*) FROM ndarray")[0][0]
+        assert 0 == dh.db.execute("SELECT COUNT(*) FROM object")[0][0]
+        with pytest.raises(KeyError):
+            dh.delete_tree("exp")
+
+        freed = dh.compact()
+        assert freed > 20 * 20000 * 8 + 1000
+        assert (tmpdir / "test_db.db").size() < 20000 * 8
+        assert [] == (tmpdir / "test_db.sidecar").listdir()
+        assert dh.compact(is_full=True) >= 0
+        assert dh.load_numpy("keep.x").shape == (10, )
+
+        # A database created without incremental auto-vacuum is switched by its first compact
+        import sqlite3
+        sqlite3.connect(str(tmpdir / "test_old.db")).execute("CREATE TABLE t (x)").connection.close()
+        old = DataHandler(str(tmpdir / "test_old"))
+        assert [(0, )] == old.db.execute("PRAGMA auto_vacuum")
+        old.compact()
+        assert [(2, )] == old.db.execute("PRAGMA auto_vacuum")
+
+        # A thread which hasn't touched the database yet
+        import threading
+        results = []
+        thread = threading.Thread(target=lambda: results.append(dh.db.vacuum()))
+        thread.start()
+        thread.join()
+        assert 1 == len(results) and results[0] >= 0
+
+    def test_processes(self, tmpdir):
+        import multiprocessing
+
+        task_name = str(tmpdir / "test_db")
+
+        with multiprocessing.Pool(16) as pool:
+            assert list(range(16)) == sorted(pool.map(save_results, [(task_name, n) for n in range(16)]))
+
+        dh = DataHandler(task_name)
+        for worker in range(16):
+            for i in range(20):
+                assert np.array_equal(np.full(100, worker * 100 + i), dh.load_numpy(f"worker{worker}.result{i}"))
+                assert np.array_equal(np.arange(i), dh.load_numpy(f"worker{worker}.shared{i}"))
+            assert {"worker": worker} == dh.load_obj(f"worker{worker}.config")
+
+        log = dh.load_numpy("log")
+        assert (16 * 20, 2) == log.shape
+        assert set(range(16 * 20)) == set(log[:, 0] * 20 + log[:, 1])
+
+        # 16 * 20 results, 20 shared arrays and the log, 16 objects
+        ids = [row[0] for row in dh.db.execute("SELECT id FROM ndarray UNION ALL SELECT id FROM object")]
+        assert 16 * 20 + 20 + 1 + 16 == len(set(ids)) == len(ids)
+        assert [16] * 20 == [row[0] for row in dh.db.execute("SELECT refcount FROM ndarray WHERE refcount > 1")]
+        assert max(ids) == dh.db.execute("SELECT value FROM config WHERE key='data_id_ptr'")[0][0]
+
+    def test_memoize(self, tmpdir):
+        import time
+
+        from mathtools.db import data_handler
+
+        dh = DataHandler(str(tmpdir / "test_db"))
+        calls = []
+
+        def fit(x_data, order=3, weights=None):
+            calls.append(order)
+            return {"coef": np.polyfit(x_data, np.sin(x_data), order), "order": order}
+
+        x_data = np.linspace(0, 1, 50)
+        memoized = dh.memoize(namespace="fit")(fit)
+
+        result = memoized(x_data)
+        assert result is memoized(x_data, 3)
+        assert memoized(x_data, order=3)["order"] == memoized(x_data.copy(), weights=None)["order"]
+        memoized(x_data, order=4)
+        memoized(x_data + 1e-12)
+        memoized(x_data.astype(np.float32))
+        assert [3, 4, 3, 3] == calls
+        assert 4 == memoized.cache_info().count
+
+        # A new run only has the database
+        rerun = dh.memoize(namespace="fit")(fit)
+        assert np.array_equal(result["coef"], rerun(x_data)["coef"])
+        assert [3, 4, 3, 3] == calls
+        assert 4 == len(dh.keys("__memoize__/fit/*", split_str="/"))
+
+        # Separate namespaces, size and age eviction
+        small = dh.memoize(namespace="small", max_size=1, max_age=0.2)(fit)
+        small(x_data)
+        small(x_data)
+        info = small.cache_info()
+        assert (0, 2, 0) == (info.hits, info.misses, info.count)
+        assert [3, 4, 3, 3, 3] == calls
+        time.sleep(0.3)
+        small(x_data)
+        assert [3, 4, 3, 3, 3, 3] == calls
+        # The recomputed result is unchanged, its refreshed time is still stored for the next run
+        rerun = dh.memoize(namespace="small", max_size=1, max_age=0.2)(fit)
+        rerun(x_data)
+        assert [3, 4, 3, 3, 3, 3] == calls
+
+        small.cache_clear(is_persistent=True)
+        assert 0 == len(dh.keys("__memoize__/small/*", split_str="/"))
+        assert 4 == len(dh.keys("__memoize__/fit/*", split_str="/"))
+
+        class Model:
+            @dh.memoize()
+            def predict(self, x_data):
+                calls.append("predict")
+                return x_data * 2
+
+        assert np.array_equal(x_data * 2, Model().predict(x_data))
+        Model().predict(x_data)
+        assert 1 == calls.count("predict")
+
+        # Sets of strings are iterated in the order of the hash seed of the process
+        import subprocess
+        import sys
+
+        code = "from mathtools.db.digest import value_digest\nprint(value_digest({'a', 'b', 'c', frozenset('xyz')}))"
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.dirname(data_handler.__file__))))
+        digests = set(subprocess.run([sys.executable, "-c", code], env=dict(env, PYTHONHASHSEED=str(seed)),
+                                     capture_output=True, text=True, check=True).stdout for seed in range(4))
+        assert 1 == len(digests)
+
+    def test_out_of_band(self, tmpdir):
+        dh = DataHandler(str(tmpdir / "test_db"), sidecar_threshold=1 << 20)
+        obj = {
+            "small": np.arange(10),
+            "medium": np.random.rand(100, 100),
+            "large": np.asfortranarray(np.random.rand(400, 400)),
+            "strided": np.random.rand(200, 200)[::2],
+            "meta": ["a", 1]
+        }
+
+        dh.save_obj("obj", obj)
+        data_size, buffers = dh.db.execute("SELECT LENGTH(data), buffers FROM object")[0]
+        assert 2 == buffers and data_size < 1000 + obj["strided"].nbytes
+        assert ["0.1.buf"] == [file for file, in dh.db.execute("SELECT file FROM buffer WHERE file IS NOT NULL")]
+
+        loaded = dh.load_obj("obj")
+        for key in ["small", "medium", "large", "strided"]:
+            assert np.array_equal(obj[key], loaded[key])
+        assert loaded["large"].flags.f_contiguous and loaded["medium"].flags.writeable
+        assert isinstance(loaded["large"].base.base, np.memmap)
+        assert obj["meta"] == loaded["meta"]
+        assert obj["medium"].nbytes + obj["large"].nbytes < dh.storage_size("obj")
+
+        # Loads don't share buffers, and copy-on-write maps don't change the file
+        loaded["medium"][0, 0] = loaded["large"][0, 0] = -1
+        reloaded = dh.load_many(["obj"])["obj"]
+        assert np.array_equal(obj["medium"], reloaded["medium"]) and np.array_equal(obj["large"], reloaded["large"])
+
+        cached = DataHandler(str(tmpdir / "test_cached"), cache_size=1 << 24, codec="zlib")
+        cached.save_obj("obj", obj)
+        cached.save_obj("same", {**obj, "medium": obj["medium"].copy()})
+        cached.save_obj("other", {"medium": obj["medium"] + 1})
+        assert 2 == cached.db.execute("SELECT COUNT(*) FROM object")[0][0]
+        for i in range(2):
+            loaded = cached.load_obj("obj")
+            assert np.array_equal(obj["large"], loaded["large"])
+            loaded["large"][0, 0] = -1
+        assert 1 == cached.cache_info().hits
+
+        # Windows can't remove the buffer files while their copy-on-write maps are open
+        del loaded, reloaded
+        dh.delete("obj")
+        assert 0 == dh.db.execute("SELECT COUNT(*) FROM buffer")[0][0]
+        assert [] == (tmpdir / "test_db.sidecar").listdir()
+
+    def test_write_queue(self, tmpdir):
+        import threading
+
+        dh = DataHandler(str(tmpdir / "test_db"), queue_size=8, cache_size=1 << 20)
+
+        # Hold the writer back, so that the saves stay queued
+        with dh.db.write_lock:
+            test_array = np.random.rand(10, 10)
+            assert dh.save_numpy("queued.x", test_array)
+            test_array[0, 0] = -1
+            dh.save_obj("queued.obj", {"x": [1, 2]})
+
+            loaded = dh.load_numpy("queued.x")
+            assert loaded[0, 0] != -1 and loaded.flags.writeable
+            assert np.array_equal(loaded[2:4], dh.load_numpy("queued.x", slices=np.s_[2:4]))
+            loaded = dh.load_obj("queued.obj")
+            loaded["x"].append(3)
+            assert {"x": [1, 2]} == dh.load_obj("queued.obj")
+
+            assert 0 == dh.db.execute("SELECT COUNT(*) FROM paths")[0][0]
+
+        dh.flush()
+        assert 2 == dh.db.execute("SELECT COUNT(*) FROM paths")[0][0]
+        with pytest.warns(UserWarning):
+            assert not dh.save_numpy("queued.x", test_array)
+
+        for i in range(100):
+            dh.append_numpy("log", np.array([i]))
+            dh.save_numpy(f"steps.{i}", np.full(3, i))
+        dh.delete("steps.0")
+        assert np.array_equal(np.arange(100), dh.load_numpy("log"))
+        assert 99 == len(dh.keys("steps.*"))
+        with pytest.raises(KeyError):
+            dh.delete("steps.0")
+
+        with dh.batch():
+            dh.save_numpy("batch.x", test_array)
+            assert dh.write_queue.get("batch\x1fx") is None
+        assert dh.exists("batch.x")
+
+        # A load inside a transaction doesn't wait for the queued writes, the writer waits for the transaction
+        with dh.batch():
+            thread = threading.Thread(target=dh.delete, args=("batch.x", ))
+            thread.start()
+            thread.join()
+            assert np.array_equal(test_array, dh.load_numpy("batch.x"))
+        dh.flush()
+        assert not dh.exists("batch.x")
+
+        # The error of a failed write is raised by the next flush
+        dh.save_numpy("bad.x", np.arange(3))
+        dh.save_numpy("bad.x.y", np.arange(3), is_force=True)
+        with pytest.raises(KeyError):
+            dh.flush()
+
+        thread = dh.write_queue.thread
+        dh.save_numpy("last", test_array)
+        dh.close()
+        assert dh.write_queue is None and not thread.is_alive()
+        assert np.array_equal(test_array, dh.load_numpy("last"))
+
+    def test_sparse(self, tmpdir):
+        import scipy.sparse as sp
+
+        dh = DataHandler(str(tmpdir / "test_db"))
+        matrix = sp.random(200, 300, density=0.01, format="csr", random_state=0)
+
+        for fmt in ["csr", "csc", "coo", "lil"]:
+            dh.save_sparse(f"adjacency.{fmt}", matrix.asformat(fmt))
+            loaded = dh.load_sparse(f"adjacency.{fmt}")
+            assert (fmt if fmt != "lil" else "csr") == loaded.format and (200, 300) == loaded.shape
+            assert 0 == (loaded != matrix).nnz
+        assert matrix.data.nbytes == dh.storage_size("adjacency.csr.data")
+
+        array = sp.coo_array(np.eye(5))
+        dh.save_sparse("eye", array)
+        assert isinstance(dh.load_sparse("eye"), sp.coo_array)
+
+        with pytest.warns(UserWarning):
+            assert not dh.save_sparse("eye", matrix)
+        dh.save_sparse("eye", matrix, is_force=True)
+        loaded = dh.load_sparse("eye")
+        assert isinstance(loaded, sp.csr_matrix) and 0 == (loaded != matrix).nnz
+        assert ["data", "format", "indices", "indptr", "shape"] == sorted(k.split(".")[1] for k in dh.keys("eye.*"))
+
+        with pytest.raises(ValueError):
+            dh.save_sparse("dense", np.eye(3))
+        dh.save_numpy("plain.x", np.eye(3))
+        with pytest.raises(KeyError):
+            dh.load_sparse("plain")
+
+    @pytest.mark.parametrize("backend", ["memory", "npy", "sqlite"])
+    def test_backends(self, tmpdir, backend):
+        from mathtools import init, dataer
+        from mathtools.db import Backend, open_backend
+
+        init(str(tmpdir / "test_db"), backend=backend)
+        test_array = np.random.rand(10, 10)
+
+        assert dataer.save_numpy("exp1.run1.loss", test_array)
+        test_array[0, 0] = -1
+        assert dataer.load_numpy("exp1.run1.loss")[0, 0] != -1
+        dataer.load_numpy("exp1.run1.loss")[0, 0] = -2
+        assert dataer.load_numpy("exp1.run1.loss")[0, 0] != -2
+
+        with pytest.warns(UserWarning):
+            assert not dataer.save_numpy("exp1.run1.loss", test_array)
+        dataer.save_numpy("exp1.run1.loss", test_array, is_force=True)
+        assert np.array_equal(test_array, dataer.load_numpy("exp1.run1.loss"))
+
+        dataer.save_obj("exp1.config", {"lr": 0.1, "name": "a/../b"})
+        dataer.save_obj("exp1/run2../..", [1, 2], split_str="/")
+        assert {"lr": 0.1, "name": "a/../b"} == dataer.load_obj("exp1.config")
+        assert [1, 2] == dataer.load_obj("exp1/run2../..", split_str="/")
+
+        with pytest.raises(KeyError):
+            dataer.save_numpy("exp1.run1.loss.x", test_array)
+        with pytest.raises(KeyError):
+            dataer.save_numpy("exp1.run1", test_array)
+        with pytest.raises(KeyError):
+            dataer.load_obj("exp1.run1.loss")
+
+        assert ["exp1/config", "exp1/run1/loss", "exp1/run2../.."] == dataer.keys(split_str="/")
+        assert ["exp1.run1.loss"] == dataer.keys("exp1.*.loss")
+        assert dataer.exists("exp1.config") and not dataer.exists("exp1")
+
+        dataer.delete("exp1.run1.loss")
+        assert not dataer.exists("exp1.run1.loss")
+        dataer.save_numpy("exp1.run1", test_array)
+        with pytest.raises(KeyError):
+            dataer.delete("exp1.run1.loss")
+
+        # The handler of a task is shared
+        assert open_backend(str(tmpdir / "test_db"), backend).exists("exp1.run1")
+        assert isinstance(open_backend(str(tmpdir / "test_db"), backend), Backend)
+        with pytest.raises(TypeError):
+            Backend()
+
+        # Options of a shared handler can't change
+        with pytest.warns(UserWarning):
+            open_backend(str(tmpdir / "test_db"), backend, cache_size=1 << 20)
+
+        with pytest.raises(ValueError):
+            init(str(tmpdir / "test_db"), backend="unknown")
+
+    def test_export_import(self, tmpdir):
+        import tracemalloc
+
+        from mathtools.utils.matlab import read_mat
+
+        dh = DataHandler(str(tmpdir / "test_db"))
+        arrays = {f"run{i}.loss": np.random.rand(1 << 17) for i in range(8)}
+        with dh.batch():
+            for key, ndarray in arrays.items():
+                dh.save_numpy(f"exp1.{key}", ndarray)
+            dh.save_numpy("exp1.grid", np.arange(12).reshape(3, 4), chunks=2)
+            dh.save_obj("exp1.config", {"lr": 0.1})
+
+        tracemalloc.start()
+        with pytest.warns(UserWarning):
+            assert 9 == dh.export("exp1", str(tmpdir / "exp1.npz"))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert peak < 2.5 * (1 << 17) * 8
+
+        with np.load(str(tmpdir / "exp1.npz")) as npz:
+            assert np.array_equal(arrays["run3.loss"], npz["run3.loss"])
+            assert np.array_equal(np.arange(12).reshape(3, 4), npz["grid"])
+
+        assert 9 == dh.import_(str(tmpdir / "exp1.npz"), "copy")
+        assert np.array_equal(arrays["run5.loss"], dh.load_numpy("copy.run5.loss"))
+        with pytest.warns(UserWarning):
+            assert 0 == dh.import_(str(tmpdir / "exp1.npz"), "copy")
+
+        with pytest.warns(UserWarning):
+            assert 9 == dh.export("exp1", str(tmpdir / "exp1.mat"), is_compressed=True)
+        mat = read_mat(str(tmpdir / "exp1.mat"))
+        assert np.array_equal(arrays["run0.loss"][None, :], mat["run0_loss"])
+        assert 9 == dh.import_(str(tmpdir / "exp1.mat"), "mat")
+        assert np.array_equal(np.arange(12).reshape(3, 4), dh.load_numpy("mat.grid"))
+
+        # Object ndarrays are only unpickled on request
+        np.savez(str(tmpdir / "objects.npz"), objects=np.array([{}, None], dtype=object))
+        with pytest.raises(ValueError):
+            dh.import_(str(tmpdir / "objects.npz"), "objects")
+        assert not dh.keys("objects.*")
+        assert 1 == dh.import_(str(tmpdir / "objects.npz"), "objects", is_allow_pickle=True)
+
+        with pytest.raises(ValueError):
+            dh.export("exp1", str(tmpdir / "exp1.csv"))
+        with pytest.raises(KeyError):
+            dh.export("missing", str(tmpdir / "missing.npz"))
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="fork is POSIX only")
+    def test_fork(self, tmpdir):
+        dh = DataHandler(str(tmpdir / "test_db"), queue_size=4, cache_size=1 << 20)
+        dh.save_numpy("parent", np.arange(3))
+        dh.flush()
+        connection = dh.db.db
+
+        pid = os.fork()
+        if (pid == 0):
+            status = 1
+            try:
+                # The child reopens the connection and restarts the writer
+                assert dh.db.db is not connection
+                assert np.array_equal(np.arange(3), dh.load_numpy("parent"))
+                dh.save_numpy("child", np.arange(4))
+                dh.flush()
+                status = 0
+            finally:
+                os._exit(status)
+
+        assert 0 == os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1])
+        assert dh.db.db is connection
+        assert np.array_equal(np.arange(4), dh.load_numpy("child"))
+
+    def test_close(self, tmpdir):
+        from mathtools.db import open_backend
+
+        dh = DataHandler(str(tmpdir / "test_db"))
+        dh.save_numpy("x", np.arange(3))
+        db = dh.db
+        dh.close()
+
+        assert DataHandler(str(tmpdir / "test_db")) is not dh
+        assert DataHandler(str(tmpdir / "test_db")).db is not db
+        assert np.array_equal(np.arange(3), DataHandler(str(tmpdir / "test_db")).load_numpy("x"))
+
+        for backend in ["memory", "npy"]:
+            handler = open_backend(str(tmpdir / "test_db"), backend)
+            handler.close()
+            assert open_backend(str(tmpdir / "test_db"), backend) is not handler
+
+    def test_init_scope(self, tmpdir):
+        import asyncio
+
+        from mathtools import init, init_scope, dataer
+        from mathtools.db import open_backend
+
+        init(str(tmpdir / "global"), backend="memory")
+
+        async def run(task_name: str, value: int):
+            with init_scope(str(tmpdir / task_name), backend="memory") as handler:
+                assert dataer.task_name == handler.task_name
+                await asyncio.sleep(0.01)
+                dataer.save_numpy("x", np.array([value]))
+                await asyncio.sleep(0.01)
+                return dataer.load_numpy("x")[0]
+
+        async def main():
+            return await asyncio.gather(run("task1", 1), run("task2", 2))
+
+        assert [1, 2] == asyncio.run(main())
+        assert not dataer.exists("x")
+        assert dataer.task_name == str(tmpdir / "global")
+        assert [2] == open_backend(str(tmpdir / "task2"), "memory").load_numpy("x").tolist()
@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+
+import mathtools
+
+
+def run_imports(code: str):
+    # Run in a fresh interpreter, the modules of this one are already imported
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(mathtools.__file__)))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"{code}\nimport sys\nprint(*sys.modules)"],
+                            env=env, capture_output=True, text=True, check=True)
+
+    # "import time: self [us] | cumulative | imported package", only the import statements are logged
+    times = {}
+    for line in result.stderr.splitlines():
+        if (line.startswith("import time:") and not line.endswith("imported package")):
+            _, cumulative, name = line[len("import time:"):].split("|")
+            times[name.strip()] = int(cumulative)
+
+    return times, set(result.stdout.split())
+
+
+class TestImport:
+    def test_import_mathtools(self):
+        times, modules = run_imports("import mathtools")
+        _, startup_modules = run_imports("pass")
+
+        assert "mathtools" in times
+        # Only the standard library is imported besides mathtools itself, the site hooks aside
+        if (sys.version_info >= (3, 10)):
+            for name in modules - startup_modules:
+                assert name.split(".")[0] in sys.stdlib_module_names | {"mathtools"}
+        for heavy in ["numpy", "matplotlib", "scipy", "mathtools.initialize", "mathtools.db"]:
+            assert heavy not in modules
+
+    def test_lazy_attrs(self):
+        _, modules = run_imports("import mathtools.drawer, mathtools.optimizer.heuristic")
+        for heavy in ["matplotlib", "scipy", "mathtools.drawer.plot", "mathtools.optimizer.heuristic.SA"]:
+            assert heavy not in modules
+
+        _, modules = run_imports("from mathtools.drawer import Plot\nfrom mathtools import dataer")
+        for name in ["matplotlib.pyplot", "mathtools.drawer.plot", "mathtools.initialize"]:
+            assert name in modules
+        for heavy in ["scipy", "mpl_toolkits.axes_grid1"]:
+            assert heavy not in modules
+
+        # The submodule of the same name, imported first, doesn't shadow the class
+        run_imports("import mathtools.optimizer.heuristic.SA\nfrom mathtools.optimizer.heuristic import SA\n"
+                    "assert isinstance(SA, type)")
+
+        from mathtools.drawer import Plot
+        from mathtools.optimizer.heuristic import GA
+
+        assert isinstance(Plot, type) and "Plot" == Plot.__name__
+        assert isinstance(GA, type) and isinstance(mathtools.optimizer.heuristic.SA, type)
+        assert "Plot" in dir(mathtools.drawer)
+        assert mathtools.db.DataHandler is not None
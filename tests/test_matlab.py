@@ -0,0 +1,84 @@
+import pytest
+
+import numpy as np
+import scipy.io as sio
+
+from mathtools.utils.matlab import LazyMat, iter_mat, list_mat, read_mat, save_mat
+
+
+class TestMatlab:
+    def test_read_mat(self, tmpdir):
+        file_path = str(tmpdir / "test.mat")
+        datas = {
+            "grid": np.arange(12, dtype=np.float64).reshape(3, 4),
+            "labels": np.arange(5, dtype=np.int32),
+            "signal": np.arange(4) + 1j,
+            "mask": np.array([True, False]),
+            "small": np.array([7], dtype=np.uint8),
+            "name": "mathtools",
+            "config": {"lr": 0.1}
+        }
+        sio.savemat(file_path, datas)
+
+        expected = sio.loadmat(file_path)
+        assert ["grid", "labels"] == list(read_mat(file_path, ["labels", "grid", "missing"]).keys())
+
+        mat = read_mat(file_path, is_lazy=True)
+        assert isinstance(mat, LazyMat)
+        assert list(datas.keys()) == list(mat.keys())
+        assert 0 == len(mat.datas)
+
+        # Uncompressed numeric arrays are mapped, the others are read
+        assert isinstance(mat["grid"], np.memmap)
+        assert isinstance(mat["labels"], np.memmap)
+        for name in datas:
+            assert expected[name].dtype == mat[name].dtype
+            assert expected[name].shape == mat[name].shape
+            if (name != "config"):
+                assert np.array_equal(expected[name], mat[name])
+        assert not isinstance(mat["signal"], np.memmap)
+        assert not isinstance(mat["mask"], np.memmap)
+        assert mat["grid"] is mat["grid"]
+
+        mat = read_mat(file_path, ["grid"], is_lazy=True)
+        assert ["grid"] == list(mat)
+        with pytest.raises(KeyError):
+            mat["labels"]
+
+        assert ("grid", (3, 4), "double") in list_mat(file_path)
+        assert len(datas) == len(list_mat(file_path))
+
+    def test_compressed_mat(self, tmpdir):
+        file_path = str(tmpdir / "test.mat")
+        datas = [(f"x{i}", np.random.rand(10, i + 1)) for i in range(5)]
+        save_mat(file_path, iter(datas), is_compressed=True)
+
+        mat = read_mat(file_path, is_lazy=True)
+        assert not isinstance(mat["x3"], np.memmap)
+        assert np.array_equal(datas[3][1], mat["x3"])
+
+        assert [name for name, _ in datas] == [name for name, _ in iter_mat(file_path)]
+
+    def test_v4_mat(self, tmpdir):
+        file_path = str(tmpdir / "test.mat")
+        sio.savemat(file_path, {"a": np.arange(3.0), "b": np.eye(2)}, format="4")
+
+        mat = read_mat(file_path, is_lazy=True)
+        assert ["a", "b"] == sorted(mat)
+        assert np.array_equal(np.eye(2), mat["b"])
+
+    def test_without_mio5(self, tmpdir, monkeypatch):
+        from mathtools.utils import matlab
+
+        # The private v5 modules of scipy are missing, the public functions are used instead
+        monkeypatch.setattr(matlab, "_mio5", lambda: (None, None))
+
+        file_path = str(tmpdir / "test.mat")
+        datas = [(f"x{i}", np.random.rand(3, i + 1)) for i in range(3)]
+        save_mat(file_path, iter(datas))
+
+        mat = read_mat(file_path, is_lazy=True)
+        assert ["x0", "x1", "x2"] == list(mat)
+        assert not isinstance(mat["x1"], np.memmap)
+        assert np.array_equal(datas[1][1], mat["x1"])
+        assert [name for name, _ in datas] == [name for name, _ in iter_mat(file_path)]